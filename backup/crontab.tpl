@@ -1 +1,3 @@
-${BACKUP_INTERVAL_CRON} /usr/local/bin/backup.sh >> /var/log/cron.log 2>&1
\ No newline at end of file
+${BACKUP_INTERVAL_CRON} /usr/local/bin/backup.sh >> /var/log/cron.log 2>&1
+${PARTITION_MAINTENANCE_CRON} psql -h ${PGHOST} -p ${POSTGRES_LEADER_PORT} -U ${PGUSER} -d ${POSTGRES_DB} -c "SELECT maintain_partitions()" >> /var/log/cron.log 2>&1
+${AGGREGATE_REFRESH_CRON} psql -h ${PGHOST} -p ${POSTGRES_LEADER_PORT} -U ${PGUSER} -d ${POSTGRES_DB} -c "SELECT refresh_aggregate_views()" >> /var/log/cron.log 2>&1
@@ -0,0 +1,129 @@
+BEGIN;
+
+-- Closure tables: one row per (ancestor, descendant) pair, including every
+-- node with itself at depth 0, so "everything under X" is a single join on
+-- the primary key instead of a WITH RECURSIVE walk.
+CREATE TABLE IF NOT EXISTS category_paths (
+                                              ancestor_id INT NOT NULL,
+                                              descendant_id INT NOT NULL,
+                                              depth INT NOT NULL,
+                                              PRIMARY KEY (ancestor_id, descendant_id),
+                                              CONSTRAINT fk_category_path_ancestor
+                                                  FOREIGN KEY(ancestor_id)
+                                                      REFERENCES ad_categories(category_id)
+                                                      ON DELETE CASCADE,
+                                              CONSTRAINT fk_category_path_descendant
+                                                  FOREIGN KEY(descendant_id)
+                                                      REFERENCES ad_categories(category_id)
+                                                      ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS location_paths (
+                                              ancestor_id INT NOT NULL,
+                                              descendant_id INT NOT NULL,
+                                              depth INT NOT NULL,
+                                              PRIMARY KEY (ancestor_id, descendant_id),
+                                              CONSTRAINT fk_location_path_ancestor
+                                                  FOREIGN KEY(ancestor_id)
+                                                      REFERENCES locations(location_id)
+                                                      ON DELETE CASCADE,
+                                              CONSTRAINT fk_location_path_descendant
+                                                  FOREIGN KEY(descendant_id)
+                                                      REFERENCES locations(location_id)
+                                                      ON DELETE CASCADE
+);
+
+CREATE INDEX idx_category_paths_descendant_id ON category_paths(descendant_id);
+CREATE INDEX idx_location_paths_descendant_id ON location_paths(descendant_id);
+
+-- Statement-level trigger on a hierarchy (TG_ARGV: paths table, key column).
+-- Inserted nodes, and the whole subtree of every node that got a new parent,
+-- have their paths rebuilt by walking up parent_id. Deleted nodes lose their
+-- paths through the ON DELETE CASCADE foreign keys; their children are moved
+-- to the top by ON DELETE SET NULL, which comes back here as an update.
+CREATE OR REPLACE FUNCTION update_hierarchy_paths()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    paths_table text := TG_ARGV[0];
+    key_column text := TG_ARGV[1];
+    rebuilt text;
+    nodes int[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        rebuilt := format('SELECT %I AS node FROM new_rows', key_column);
+    ELSE
+        EXECUTE format(
+            'SELECT n.%2$I FROM new_rows n JOIN old_rows o ON o.%2$I = n.%2$I '
+            'JOIN %1$I p ON p.ancestor_id = n.%2$I AND p.descendant_id = n.parent_id '
+            'WHERE n.parent_id IS DISTINCT FROM o.parent_id LIMIT 1',
+            paths_table, key_column
+        ) INTO rebuilt;
+        IF rebuilt IS NOT NULL THEN
+            RAISE EXCEPTION '%: moving % % under its own descendant would create a cycle',
+                TG_TABLE_NAME, key_column, rebuilt;
+        END IF;
+        rebuilt := format(
+            'SELECT DISTINCT p.descendant_id AS node FROM new_rows n JOIN old_rows o ON o.%2$I = n.%2$I '
+            'JOIN %1$I p ON p.ancestor_id = n.%2$I WHERE n.parent_id IS DISTINCT FROM o.parent_id',
+            paths_table, key_column
+        );
+    END IF;
+
+    EXECUTE format('SELECT array_agg(node) FROM (%s) rebuilt', rebuilt) INTO nodes;
+    IF nodes IS NULL THEN
+        RETURN NULL;
+    END IF;
+    EXECUTE format('DELETE FROM %I WHERE descendant_id = ANY($1)', paths_table) USING nodes;
+    -- The walk stops after as many steps as there are nodes, so a cycle made
+    -- by several moves in one statement ends in a primary key violation
+    -- instead of an endless loop.
+    EXECUTE format(
+        'WITH RECURSIVE walk AS ('
+        '    SELECT node AS ancestor_id, node AS descendant_id, 0 AS depth FROM unnest($1) node '
+        '    UNION ALL '
+        '    SELECT t.parent_id, w.descendant_id, w.depth + 1 FROM walk w JOIN %3$I t ON t.%2$I = w.ancestor_id '
+        '    WHERE t.parent_id IS NOT NULL AND w.depth < (SELECT COUNT(*) FROM %3$I)'
+        ') '
+        'INSERT INTO %1$I (ancestor_id, descendant_id, depth) SELECT ancestor_id, descendant_id, depth FROM walk',
+        paths_table, key_column, TG_TABLE_NAME
+    ) USING nodes;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER category_paths_insert AFTER INSERT ON ad_categories
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_hierarchy_paths('category_paths', 'category_id');
+CREATE TRIGGER category_paths_update AFTER UPDATE ON ad_categories
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_hierarchy_paths('category_paths', 'category_id');
+CREATE TRIGGER location_paths_insert AFTER INSERT ON locations
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_hierarchy_paths('location_paths', 'location_id');
+CREATE TRIGGER location_paths_update AFTER UPDATE ON locations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION update_hierarchy_paths('location_paths', 'location_id');
+
+INSERT INTO category_paths (ancestor_id, descendant_id, depth)
+WITH RECURSIVE walk AS (
+    SELECT category_id AS ancestor_id, category_id AS descendant_id, 0 AS depth FROM ad_categories
+    UNION ALL
+    SELECT c.parent_id, w.descendant_id, w.depth + 1
+    FROM walk w JOIN ad_categories c ON c.category_id = w.ancestor_id
+    WHERE c.parent_id IS NOT NULL
+)
+SELECT ancestor_id, descendant_id, depth FROM walk;
+
+INSERT INTO location_paths (ancestor_id, descendant_id, depth)
+WITH RECURSIVE walk AS (
+    SELECT location_id AS ancestor_id, location_id AS descendant_id, 0 AS depth FROM locations
+    UNION ALL
+    SELECT l.parent_id, w.descendant_id, w.depth + 1
+    FROM walk w JOIN locations l ON l.location_id = w.ancestor_id
+    WHERE l.parent_id IS NOT NULL
+)
+SELECT ancestor_id, descendant_id, depth FROM walk;
+
+COMMIT;
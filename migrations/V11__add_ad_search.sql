@@ -0,0 +1,24 @@
+BEGIN;
+
+-- Title words weigh more than description words in ts_rank. Adding a stored
+-- generated column rewrites advertisements once, under an exclusive lock.
+ALTER TABLE advertisements ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', title), 'A') ||
+        setweight(to_tsvector('english', description), 'B')
+    ) STORED;
+
+CREATE INDEX idx_advertisements_search_vector ON advertisements USING GIN (search_vector);
+
+-- Fuzzy and substring title matching (similarity, %, ILIKE '%...%') when the
+-- server ships pg_trgm; without it those searches fall back to a scan.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX idx_advertisements_title_trgm ON advertisements USING GIN (title gin_trgm_ops);
+    END IF;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,138 @@
+BEGIN;
+
+-- Monthly range partitions named <table>_pYYYYMM covering [from_date, to_date).
+-- Existing partitions are kept; rows of a new month that already sit in the
+-- default partition are moved into the new partition before it is attached.
+CREATE OR REPLACE FUNCTION create_monthly_partitions(parent regclass, from_date date, to_date date)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    parent_name text;
+    key_column text;
+    default_partition regclass;
+    month_start date := date_trunc('month', from_date);
+    month_end date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    SELECT c.relname, a.attname, NULLIF(p.partdefid, 0)::regclass
+    INTO parent_name, key_column, default_partition
+    FROM pg_partitioned_table p
+    JOIN pg_class c ON c.oid = p.partrelid
+    JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+    WHERE p.partrelid = parent;
+
+    WHILE month_start < to_date LOOP
+        month_end := month_start + INTERVAL '1 month';
+        partition_name := format('%s_p%s', parent_name, to_char(month_start, 'YYYYMM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            IF default_partition IS NULL THEN
+                EXECUTE format('CREATE TABLE %I PARTITION OF %s FOR VALUES FROM (%L) TO (%L)',
+                               partition_name, parent, month_start, month_end);
+            ELSE
+                EXECUTE format('CREATE TABLE %I (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                               partition_name, parent);
+                EXECUTE format('WITH moved AS (DELETE FROM %s WHERE %I >= %L AND %I < %L RETURNING *) '
+                               'INSERT INTO %I SELECT * FROM moved',
+                               default_partition, key_column, month_start, key_column, month_end, partition_name);
+                EXECUTE format('ALTER TABLE %s ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                               parent, partition_name, month_start, month_end);
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$;
+
+-- Retention: drops the monthly partitions that end on or before `before`.
+-- Dropping a partition is a catalog change, unlike a DELETE of its rows.
+CREATE OR REPLACE FUNCTION drop_monthly_partitions(parent regclass, before date)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    partition record;
+    dropped integer := 0;
+BEGIN
+    FOR partition IN
+        SELECT i.inhrelid::regclass AS name
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE i.inhparent = parent
+        AND to_date(substring(c.relname FROM '^' || p.relname || '_p(\d{6})$'), 'YYYYMM')
+            + INTERVAL '1 month' <= before
+    LOOP
+        EXECUTE format('DROP TABLE %s', partition.name);
+        dropped := dropped + 1;
+    END LOOP;
+    RETURN dropped;
+END;
+$$;
+
+-- Run daily from the db_backup container's cron: keeps three months of
+-- partitions ahead of the clock.
+CREATE OR REPLACE FUNCTION maintain_partitions()
+RETURNS integer
+LANGUAGE sql
+AS $$
+    SELECT create_monthly_partitions('messages', current_date, (current_date + INTERVAL '3 months')::date);
+$$;
+
+ALTER TABLE messages RENAME TO messages_heap;
+ALTER INDEX messages_pkey RENAME TO messages_heap_pkey;
+ALTER SEQUENCE messages_message_id_seq RENAME TO messages_heap_message_id_seq;
+DROP INDEX idx_messages_sender_id;
+DROP INDEX idx_messages_recipient_id;
+DROP INDEX idx_messages_conversation_id;
+DROP INDEX idx_messages_send_date;
+
+-- The partition key has to be part of the primary key. Nothing references
+-- messages, so the wider key costs no foreign keys.
+CREATE TABLE messages (
+                          message_id INT GENERATED ALWAYS AS IDENTITY,
+                          sender_id INT NOT NULL,
+                          recipient_id INT NOT NULL,
+                          conversation_id INT NOT NULL,
+                          content TEXT NOT NULL,
+                          send_date TIMESTAMP NOT NULL,
+                          is_read BOOLEAN DEFAULT FALSE,
+                          PRIMARY KEY (message_id, send_date),
+                          CONSTRAINT fk_message_sender
+                              FOREIGN KEY(sender_id)
+                                  REFERENCES users(user_id)
+                                  ON DELETE CASCADE,
+                          CONSTRAINT fk_message_recipient
+                              FOREIGN KEY(recipient_id)
+                                  REFERENCES users(user_id)
+                                  ON DELETE CASCADE,
+                          CONSTRAINT fk_message_conversation
+                              FOREIGN KEY(conversation_id)
+                                  REFERENCES conversations(conversation_id)
+                                  ON DELETE CASCADE
+) PARTITION BY RANGE (send_date);
+
+SELECT create_monthly_partitions(
+    'messages',
+    COALESCE((SELECT MIN(send_date) FROM messages_heap)::date, current_date),
+    (current_date + INTERVAL '3 months')::date
+);
+-- Catches rows outside the monthly partitions (e.g. clock skew) instead of
+-- failing the insert; create_monthly_partitions moves them out later.
+CREATE TABLE messages_default PARTITION OF messages DEFAULT;
+
+INSERT INTO messages OVERRIDING SYSTEM VALUE SELECT * FROM messages_heap;
+SELECT setval(pg_get_serial_sequence('messages', 'message_id'),
+              COALESCE(MAX(message_id), 1), MAX(message_id) IS NOT NULL)
+FROM messages_heap;
+DROP TABLE messages_heap;
+
+CREATE INDEX idx_messages_sender_id ON messages(sender_id);
+CREATE INDEX idx_messages_recipient_id ON messages(recipient_id);
+CREATE INDEX idx_messages_conversation_id ON messages(conversation_id);
+CREATE INDEX idx_messages_send_date ON messages(send_date);
+
+COMMIT;
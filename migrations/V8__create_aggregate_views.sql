@@ -0,0 +1,66 @@
+BEGIN;
+
+-- Per-category ad counts and prices. Sums are kept next to the averages so
+-- rollups by category name (or any other grouping) stay exact.
+CREATE MATERIALIZED VIEW category_ad_stats AS
+SELECT
+    a.category_id,
+    COUNT(*) AS ad_count,
+    SUM(a.price) AS price_sum,
+    AVG(a.price) AS avg_price,
+    COUNT(*) FILTER (WHERE a.status_id = 1) AS active_ad_count,
+    AVG(a.price) FILTER (WHERE a.status_id = 1) AS active_avg_price
+FROM advertisements a
+GROUP BY a.category_id;
+
+CREATE UNIQUE INDEX idx_category_ad_stats_category_id ON category_ad_stats(category_id);
+
+-- Seller ratings per city, one row per ad placed there (as in the city
+-- ratings report, which averages over users joined with their ads).
+CREATE MATERIALIZED VIEW city_rating_stats AS
+SELECT
+    a.location_id,
+    COUNT(u.user_id) AS ad_count,
+    COUNT(up.rating) AS rating_count,
+    SUM(up.rating) AS rating_sum
+FROM users u
+JOIN user_profiles up ON u.user_id = up.user_id
+JOIN advertisements a ON u.user_id = a.user_id
+JOIN locations l ON a.location_id = l.location_id
+WHERE l.type = 'city'
+GROUP BY a.location_id;
+
+CREATE UNIQUE INDEX idx_city_rating_stats_location_id ON city_rating_stats(location_id);
+
+CREATE TABLE IF NOT EXISTS aggregate_view_refreshes (
+                                                       view_name TEXT PRIMARY KEY,
+                                                       refreshed_at TIMESTAMPTZ NOT NULL,
+                                                       duration INTERVAL NOT NULL
+);
+
+INSERT INTO aggregate_view_refreshes (view_name, refreshed_at, duration)
+VALUES ('category_ad_stats', now(), INTERVAL '0'),
+       ('city_rating_stats', now(), INTERVAL '0');
+
+-- Run from the db_backup container's cron (AGGREGATE_REFRESH_CRON). CONCURRENTLY
+-- keeps the views readable during the refresh; it needs the unique indexes.
+CREATE OR REPLACE FUNCTION refresh_aggregate_views()
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    matview TEXT;
+    started TIMESTAMPTZ;
+BEGIN
+    FOREACH matview IN ARRAY ARRAY['category_ad_stats', 'city_rating_stats'] LOOP
+        started := clock_timestamp();
+        EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %I', matview);
+        INSERT INTO aggregate_view_refreshes (view_name, refreshed_at, duration)
+        VALUES (matview, clock_timestamp(), clock_timestamp() - started)
+        ON CONFLICT ON CONSTRAINT aggregate_view_refreshes_pkey
+            DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at, duration = EXCLUDED.duration;
+    END LOOP;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,129 @@
+BEGIN;
+
+ALTER TABLE advertisements ADD COLUMN photos_count INT NOT NULL DEFAULT 0;
+ALTER TABLE advertisements ADD COLUMN messages_count INT NOT NULL DEFAULT 0;
+ALTER TABLE conversations ADD COLUMN messages_count INT NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN ads_count INT NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN messages_count INT NOT NULL DEFAULT 0;
+ALTER TABLE users ADD COLUMN reviews_count INT NOT NULL DEFAULT 0;
+
+CREATE INDEX idx_users_ads_count ON users(ads_count);
+
+-- Every counter column: target.counter = SUM(weight) (or COUNT(*) without a
+-- weight) of the source rows grouped by source_key. Counters are recounted in
+-- position order, so a counter summed from another one comes after it.
+CREATE TABLE IF NOT EXISTS counter_columns (
+                                               position INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+                                               source_table TEXT NOT NULL,
+                                               source_key TEXT NOT NULL,
+                                               target_table TEXT NOT NULL,
+                                               target_key TEXT NOT NULL,
+                                               counter TEXT NOT NULL,
+                                               weight TEXT,
+                                               UNIQUE (target_table, counter)
+);
+
+-- Creates the counter's statement-level triggers on the source table. They
+-- run one UPDATE per statement with the net change per key, however many rows
+-- the statement touched; updates that keep the key (and weight) add up to
+-- zero and write nothing. Each counter gets its own trigger function with
+-- static SQL, so sessions cache its plans instead of planning every call.
+CREATE OR REPLACE FUNCTION add_counter(source_table text, source_key text, target_table text,
+                                       target_key text, counter text, weight text DEFAULT NULL)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    trigger_function text := format('count_%s_%s', target_table, counter);
+    delta text := COALESCE(quote_ident(weight), '1');
+    apply text := format(
+        'UPDATE %1$I t SET %3$I = t.%3$I + d.delta '
+        'FROM (SELECT key, SUM(delta) AS delta FROM (%%s) changes GROUP BY key HAVING SUM(delta) <> 0) d '
+        'WHERE t.%2$I = d.key;',
+        target_table, target_key, counter
+    );
+    operation text;
+BEGIN
+    INSERT INTO counter_columns (source_table, source_key, target_table, target_key, counter, weight)
+    VALUES (source_table, source_key, target_table, target_key, counter, weight);
+
+    EXECUTE format(
+        'CREATE FUNCTION %I() RETURNS trigger LANGUAGE plpgsql AS $body$ BEGIN '
+        'IF TG_OP = ''INSERT'' THEN %s '
+        'ELSIF TG_OP = ''DELETE'' THEN %s '
+        'ELSE %s END IF; RETURN NULL; END; $body$',
+        trigger_function,
+        format(apply, format('SELECT %I AS key, %s AS delta FROM new_rows', source_key, delta)),
+        format(apply, format('SELECT %I AS key, -%s AS delta FROM old_rows', source_key, delta)),
+        format(apply, format('SELECT %1$I AS key, %2$s AS delta FROM new_rows '
+                             'UNION ALL SELECT %1$I, -%2$s FROM old_rows', source_key, delta))
+    );
+
+    FOREACH operation IN ARRAY ARRAY['insert', 'update', 'delete'] LOOP
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER %s ON %I REFERENCING %s FOR EACH STATEMENT EXECUTE FUNCTION %I()',
+            format('%s_%s', trigger_function, operation), upper(operation), source_table,
+            CASE operation
+                WHEN 'insert' THEN 'NEW TABLE AS new_rows'
+                WHEN 'delete' THEN 'OLD TABLE AS old_rows'
+                ELSE 'OLD TABLE AS old_rows NEW TABLE AS new_rows'
+            END,
+            trigger_function
+        );
+    END LOOP;
+END;
+$$;
+
+-- Recomputes every counter from scratch, writing only the rows that are off.
+-- Seeding runs it once after loading with the triggers disabled.
+CREATE OR REPLACE FUNCTION recount_counters()
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    c counter_columns;
+BEGIN
+    FOR c IN SELECT * FROM counter_columns ORDER BY position LOOP
+        EXECUTE format(
+            'UPDATE %1$I t SET %3$I = d.total '
+            'FROM (SELECT t.%2$I AS key, COALESCE(s.total, 0) AS total FROM %1$I t '
+            'LEFT JOIN (SELECT %4$I AS key, SUM(%5$s) AS total FROM %6$I GROUP BY %4$I) s ON s.key = t.%2$I) d '
+            'WHERE t.%2$I = d.key AND t.%3$I <> d.total',
+            c.target_table, c.target_key, c.counter, c.source_key,
+            COALESCE(quote_ident(c.weight), '1'), c.source_table
+        );
+    END LOOP;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION set_counter_triggers(enabled boolean)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    c counter_columns;
+    operation text;
+BEGIN
+    FOR c IN SELECT * FROM counter_columns ORDER BY position LOOP
+        FOREACH operation IN ARRAY ARRAY['insert', 'update', 'delete'] LOOP
+            EXECUTE format('ALTER TABLE %I %s TRIGGER %I', c.source_table,
+                           CASE WHEN enabled THEN 'ENABLE' ELSE 'DISABLE' END,
+                           format('count_%s_%s_%s', c.target_table, c.counter, operation));
+        END LOOP;
+    END LOOP;
+END;
+$$;
+
+SELECT add_counter('ad_photos', 'ad_id', 'advertisements', 'ad_id', 'photos_count');
+-- Messages of an ad are counted per conversation and summed up from there: a
+-- cascaded message delete no longer finds its (deleted) conversation, but the
+-- conversation's own delete still takes its count off the ad.
+SELECT add_counter('messages', 'conversation_id', 'conversations', 'conversation_id', 'messages_count');
+SELECT add_counter('conversations', 'ad_id', 'advertisements', 'ad_id', 'messages_count', 'messages_count');
+SELECT add_counter('advertisements', 'user_id', 'users', 'user_id', 'ads_count');
+SELECT add_counter('messages', 'sender_id', 'users', 'user_id', 'messages_count');
+SELECT add_counter('reviews', 'reviewer_id', 'users', 'user_id', 'reviews_count');
+
+SELECT recount_counters();
+
+COMMIT;
@@ -1,15 +1,52 @@
 import psycopg2
 from psycopg2.extras import execute_values
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta
+from itertools import chain, islice
+from array import array
+import gzip
+import hashlib
+import io
+import json
+import math
+import numpy as np
+import multiprocessing
 import random
+import resource
+import shutil
 import string
+import threading
+import time
 from faker import Faker
 import os
-
-fake = Faker()
+import zlib
 
 APP_ENV = os.getenv("APP_ENV")
-SEED_COUNT = int(os.getenv('SEED_COUNT', 10))
+# TPC-style scale factor: every scaled table gets SCALE_ROWS * SEED_SCALE rows.
+SEED_SCALE = float(os.getenv('SEED_SCALE', 0.001))
+SEED_LOADER = os.getenv('SEED_LOADER', 'values')
+COPY_BUFFER_BYTES = int(os.getenv('COPY_BUFFER_BYTES', 8 * 1024 * 1024))
+SEED_WORKERS = int(os.getenv('SEED_WORKERS', os.cpu_count() or 1))
+SEED_CHUNK_SIZE = int(os.getenv('SEED_CHUNK_SIZE', 10000))
+SEED_RANDOM_SEED = int(os.getenv('SEED_RANDOM_SEED', 42))
+SEED_CONNECTIONS = int(os.getenv('SEED_CONNECTIONS', 4))
+TEXT_POOL_SIZE = int(os.getenv('TEXT_POOL_SIZE', 1000))
+# Zipf exponent for users->ads and ads->conversations; 0 keeps them uniform.
+SEED_SKEW = float(os.getenv('SEED_SKEW', 0))
+# Number of message bursts in the send_date window; 0 disables them.
+SEED_BURSTS = int(os.getenv('SEED_BURSTS', 0))
+SEED_BURST_SHARE = float(os.getenv('SEED_BURST_SHARE', 0.5))
+SEED_BURST_HOURS = float(os.getenv('SEED_BURST_HOURS', 6))
+SEED_FAST_LOAD = os.getenv('SEED_FAST_LOAD', 'false').lower() in ('1', 'true', 'yes')
+SEED_INDEX_WORKERS = int(os.getenv('SEED_INDEX_WORKERS', 4))
+SEED_MAINTENANCE_WORK_MEM = os.getenv('SEED_MAINTENANCE_WORK_MEM', '512MB')
+SEED_REPORT_FILE = os.getenv('SEED_REPORT_FILE', 'seed_report.json')
+# Directory of generated datasets replayed on later runs; empty disables it.
+SEED_CACHE_DIR = os.getenv('SEED_CACHE_DIR', 'seed_cache')
+MIGRATION_VERSION = os.getenv('MIGRATION_VERSION', 'latest')
+
+LOADERS = ('values', 'copy')
 
 DB_CONFIG = {
     "host": os.getenv("POSTGRES_HOST", "haproxy"),
@@ -20,115 +57,530 @@ DB_CONFIG = {
 }
 
 
-def get_random_string(length):
+LOAD_STATS = {}
+
+THREAD_STATE = threading.local()
+
+# Keys (and a few attributes) of the rows seeded so far. Seed functions assign
+# the keys themselves and register them here, so child tables pick their
+# parents without reading them back from the database.
+KEY_REGISTRY = {}
+KEY_ATTRIBUTES = {}
+
+AD_TYPES = ('Product', 'Service', 'Job', 'Real Estate')
+
+# Rows per unit of SEED_SCALE. Lookup tables have fixed contents; photos and
+# messages follow from the per-parent fan-outs below.
+SCALE_ROWS = {
+    'users': 20000,
+    'password_resets': 5000,
+    'advertisements': 50000,
+    'conversations': 20000,
+    'reviews': 30000,
+    'complaints': 15000,
+    'safe_deals': 10000,
+}
+MAX_PHOTOS_PER_AD = 5
+MAX_MESSAGES_PER_CONVERSATION = 10
+# Messages are spread over this many days back from now.
+MESSAGE_HISTORY_DAYS = 91
+
+# Chunks already committed by an earlier, interrupted run of the same dataset;
+# see load_checkpoints. WHOLE_TABLE marks a table replayed from the cache.
+COMPLETED_CHUNKS = {}
+CHECKPOINT = {}
+WHOLE_TABLE = -1
+
+# Pre-generated Faker values per process; see text_pool.
+TEXT_POOLS = {}
+
+# Read-only lookup data for the generator functions, handed to each pool
+# worker once instead of being pickled with every task.
+WORKER_CONTEXT = {}
+
+# Dataset cache being written by the current run; see cache_rows.
+DATASET_CACHE = {}
+CACHE_LOCK = threading.Lock()
+
+# table -> identity column synced after explicit keys were loaded.
+IDENTITY_KEYS = {}
+
+COPY_ESCAPES = str.maketrans({
+    '\\': '\\\\',
+    '\t': '\\t',
+    '\n': '\\n',
+    '\r': '\\r',
+})
+
+
+def get_random_string(rng, length):
     letters = string.ascii_lowercase
-    return ''.join(random.choice(letters) for _ in range(length))
+    return ''.join(rng.choice(letters) for _ in range(length))
 
 
-def check_table_exists(conn, table_name):
+def fetch_existing_tables(conn):
     with conn.cursor() as cursor:
         cursor.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = %s
-            );
-        """, (table_name,))
-        return cursor.fetchone()[0]
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_schema = 'public'
+        """)
+        return {row[0] for row in cursor.fetchall()}
 
 
-def seed_users(conn):
-    print("Seeding users...")
+def scaled_count(table):
+    return max(1, round(SCALE_ROWS[table] * SEED_SCALE))
+
+
+def register_keys(table, keys):
+    KEY_REGISTRY[table] = keys
+
+
+def registered_keys(table):
+    return KEY_REGISTRY.get(table, range(0))
+
+
+def track_attributes(table, rows, columns):
+    # columns: attribute name -> (row index, array typecode). Compact arrays
+    # indexed by key offset keep this to a few bytes per row.
+    attributes = {name: array(typecode) for name, (_, typecode) in columns.items()}
+    KEY_ATTRIBUTES[table] = attributes
+    for chunk_no, chunk in rows:
+        for row in chunk:
+            for name, (index, _) in columns.items():
+                attributes[name].append(row[index])
+        yield chunk_no, chunk
+
+
+def key_attribute(table, name, key):
+    return KEY_ATTRIBUTES[table][name][key - registered_keys(table).start]
+
+
+def sync_identity(conn, table, key):
+    # Keys are written explicitly, so move the identity sequence past them.
+    IDENTITY_KEYS[table] = key
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT setval(pg_get_serial_sequence(%s, %s),
+                          COALESCE(MAX({key}), 1), MAX({key}) IS NOT NULL)
+            FROM {table}
+        """, (table, key))
+    conn.commit()
+
+
+def seed_lookup_table(conn, table, key, columns, rows):
+    rows = [(key_value, *row) for key_value, row in enumerate(rows, 1)]
+    insert_rows(conn, table, (key, *columns), [(0, rows)])
+    sync_identity(conn, table, key)
+    register_keys(table, range(1, len(rows) + 1))
+
+
+def sample_distinct(rng, ids, count):
+    # Walks an affine permutation of `ids`, so distinct keys can be drawn
+    # without materialising either the population or the sample.
+    size = len(ids)
+    if size == 0:
+        return
+    step = 1
+    if size > 1:
+        step = rng.randrange(1, size)
+        while math.gcd(step, size) != 1:
+            step = rng.randrange(1, size)
+    offset = rng.randrange(size)
+    for i in range(min(count, size)):
+        yield ids[(offset + i * step) % size]
+
+
+def iter_skewed_keys(table, keys, count):
+    for chunk_no, _, size in chunk_counts(count):
+        yield from skewed_keys(chunk_np_rng(f'{table}:keys', chunk_no), keys, size).tolist()
+
+
+def choice_except(rng, ids, excluded):
+    if len(ids) < 2:
+        return None
+    while True:
+        value = rng.choice(ids)
+        if value != excluded:
+            return value
+
+
+def batched(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+def chunk_seed(table, chunk_no):
+    return zlib.crc32(f'{SEED_RANDOM_SEED}:{table}:{chunk_no}'.encode())
+
+
+def chunk_rng(table, chunk_no):
+    # Tables are seeded from several threads and chunks in several processes,
+    # so every chunk draws from its own RNG and a per-thread Faker instance.
+    seed = chunk_seed(table, chunk_no)
+    faker = getattr(THREAD_STATE, 'fake', None)
+    if faker is None:
+        faker = THREAD_STATE.fake = Faker()
+    faker.seed_instance(seed)
+    return random.Random(seed), faker
+
+
+def table_rng(table):
+    return chunk_rng(table, 'table')
+
+
+def chunk_np_rng(table, chunk_no):
+    return np.random.default_rng(chunk_seed(table, chunk_no))
+
+
+def text_pool(name, make_text):
+    # Faker dominates per-row cost, so text columns sample from a fixed pool
+    # generated once per process (deterministically, so every worker agrees).
+    pool = TEXT_POOLS.get(name)
+    if pool is None:
+        _, fake = chunk_rng(name, 'pool')
+        pool = np.array([make_text(fake) for _ in range(TEXT_POOL_SIZE)], dtype=object)
+        TEXT_POOLS[name] = pool
+    return pool
+
+
+def sample_column(np_rng, values, count):
+    values = np.asarray(values, dtype=object)
+    return values[np_rng.integers(0, len(values), count)]
+
+
+def random_keys(np_rng, keys, count):
+    return np_rng.integers(keys.start, keys.stop, count)
+
+
+def zipf_ranks(np_rng, size, count, exponent):
+    # Inverse CDF of the continuous power law x^-s on [1, size + 1): bounded,
+    # vectorised and O(1) in memory, unlike a per-key probability table.
+    u = np_rng.random(count)
+    if abs(exponent - 1) < 1e-9:
+        x = np.power(size + 1.0, u)
+    else:
+        a = 1 - exponent
+        x = np.power(((size + 1.0) ** a - 1) * u + 1, 1 / a)
+    return np.minimum(x.astype(np.int64) - 1, size - 1)
+
+
+def scatter_ranks(ranks, size):
+    # Spread the hottest ranks over the key range instead of piling them onto
+    # the first ids, which would also be the first (and best cached) pages.
+    stride = int(size * 0.6180339887) | 1
+    while math.gcd(stride, size) != 1:
+        stride += 2
+    return (ranks * stride + size // 2) % size
+
+
+def skewed_keys(np_rng, keys, count):
+    if SEED_SKEW <= 0:
+        return random_keys(np_rng, keys, count)
+    ranks = zipf_ranks(np_rng, len(keys), count, SEED_SKEW)
+    return keys.start + scatter_ranks(ranks, len(keys))
+
+
+def random_money(np_rng, low, high, count):
+    return np.round(np_rng.uniform(low, high, count), 2)
+
+
+def random_datetimes(np_rng, start, end, count):
+    span = (end - start).astype('int64')
+    offsets = (np_rng.random(count) * span).astype('int64')
+    return start + offsets.astype('timedelta64[us]')
+
+
+def bursty_datetimes(np_rng, start, end, count):
+    dates = random_datetimes(np_rng, start, end, count)
+    if SEED_BURSTS <= 0:
+        return dates
+
+    # Burst centres are shared by all chunks: they come from a fixed seed, as
+    # fractions of the window so chunks generated a moment apart still agree.
+    span = (end - start).astype('int64')
+    burst_rng = np.random.default_rng(chunk_seed('send_date', 'bursts'))
+    centres = start + (burst_rng.random(SEED_BURSTS) * span).astype('int64').astype('timedelta64[us]')
+
+    in_burst = np_rng.random(count) < SEED_BURST_SHARE
+    burst_count = int(in_burst.sum())
+    jitter = np_rng.normal(0, SEED_BURST_HOURS * 3600e6 / 2, burst_count).astype('int64')
+    burst_dates = centres[np_rng.integers(0, SEED_BURSTS, burst_count)] + jitter.astype('timedelta64[us]')
+    dates[in_burst] = np.minimum(np.maximum(burst_dates, start), end)
+    return dates
+
+
+def days_ago(now, days):
+    return now - np.timedelta64(days, 'D').astype('timedelta64[us]')
+
+
+def nullable(values, present):
+    values = values.astype(object)
+    values[~present] = None
+    return values
+
+
+def column_rows(*columns):
+    return list(zip(*(column.tolist() for column in columns)))
+
+
+def chunk_counts(count):
+    for chunk_no, start in enumerate(range(0, count, SEED_CHUNK_SIZE)):
+        yield chunk_no, start, min(SEED_CHUNK_SIZE, count - start)
+
+
+def chunk_items(items):
+    return enumerate(batched(items, SEED_CHUNK_SIZE))
+
+
+def pending_chunks(table, tasks):
+    # Tasks start with their chunk number; chunks committed by an interrupted
+    # run are not generated again. Chunk seeds and keys only depend on the
+    # chunk number, so the remaining chunks come out exactly as before.
+    completed = COMPLETED_CHUNKS.get(table, ())
+    if WHOLE_TABLE in completed:
+        return
+    for task in tasks:
+        if task[0] not in completed:
+            yield task
+
+
+def init_worker(context):
+    global WORKER_CONTEXT
+    WORKER_CONTEXT = context
+
+
+def run_worker_task(generator, task):
+    return generator(task, WORKER_CONTEXT)
+
+
+def generate_chunks(generator, tasks, context, parallel):
+    tasks = iter(tasks)
+    first_tasks = list(islice(tasks, 2))
+    tasks = chain(first_tasks, tasks)
+
+    if not parallel or SEED_WORKERS <= 1 or len(first_tasks) <= 1:
+        for task in tasks:
+            yield task[0], generator(task, context)
+        return
+
+    # forkserver rather than fork: the scheduler runs seed functions on threads.
+    # At most two chunks per worker are in flight, so a slow writer throttles
+    # generation instead of letting finished chunks pile up in memory.
+    mp = multiprocessing.get_context('forkserver')
+    with mp.Pool(SEED_WORKERS, initializer=init_worker, initargs=(context,)) as pool:
+        in_flight = deque()
+        for task in tasks:
+            in_flight.append((task[0], pool.apply_async(run_worker_task, (generator, task))))
+            if len(in_flight) >= 2 * SEED_WORKERS:
+                chunk_no, result = in_flight.popleft()
+                yield chunk_no, result.get()
+        while in_flight:
+            chunk_no, result = in_flight.popleft()
+            yield chunk_no, result.get()
+
+
+def generate_rows(generator, tasks, context=None, parallel=False):
+    # Yields (chunk number, rows) per task.
+    return generate_chunks(generator, tasks, context or {}, parallel)
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_line(row):
+    return '\t'.join(map(copy_value, row)) + '\n'
+
+
+def flush_copy_buffer(cursor, statement, buffer):
+    if buffer.tell() == 0:
+        return
+    buffer.seek(0)
+    cursor.copy_expert(statement, buffer)
+    buffer.seek(0)
+    buffer.truncate()
+
+
+def copy_rows(cursor, table, columns, rows):
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    buffer = io.StringIO()
+    count = 0
+
+    for row in rows:
+        buffer.write(copy_line(row))
+        count += 1
+        if buffer.tell() >= COPY_BUFFER_BYTES:
+            flush_copy_buffer(cursor, statement, buffer)
+
+    flush_copy_buffer(cursor, statement, buffer)
+    return count
+
+
+def values_rows(cursor, table, columns, rows):
+    execute_values(
+        cursor,
+        f"INSERT INTO {table} ({', '.join(columns)}) OVERRIDING SYSTEM VALUE VALUES %s",
+        rows
+    )
+    return len(rows)
+
+
+def insert_rows(conn, table, columns, chunks):
+    # Chunks arrive lazily and each one is loaded and committed together with
+    # its checkpoint, so memory is bounded by the chunk size, not the table
+    # size, and an interrupted run resumes after the last committed chunk.
+    start_time = time.perf_counter()
+    completed = COMPLETED_CHUNKS.get(table, ())
+    count = 0
+    for chunk_no, rows in chunks:
+        if chunk_no in completed or WHOLE_TABLE in completed:
+            continue
+        with conn.cursor() as cursor:
+            if SEED_LOADER == 'copy':
+                loaded = copy_rows(cursor, table, columns, rows)
+            else:
+                loaded = values_rows(cursor, table, columns, rows)
+            mark_chunk(cursor, table, chunk_no, loaded)
+        conn.commit()
+        count += loaded
+        if DATASET_CACHE:
+            cache_rows(table, columns, rows)
+
+    record_load(table, count, time.perf_counter() - start_time, SEED_LOADER)
+
+
+def record_load(table, count, elapsed, loader):
+    total_rows, total_time = LOAD_STATS.get(table, (0, 0.0))
+    LOAD_STATS[table] = (total_rows + count, total_time + elapsed)
+    rate = count / elapsed if elapsed > 0 else 0
+    print(f"  {table}: {count} rows in {elapsed:.3f}s ({rate:.0f} rows/s, {loader})")
+
+
+def print_load_summary(loader=SEED_LOADER):
+    print(f"Load summary ({loader} loader):")
+    total_rows = 0
+    total_time = 0.0
+    for table, (count, elapsed) in LOAD_STATS.items():
+        rate = count / elapsed if elapsed > 0 else 0
+        print(f"  {table:<20} {count:>10} rows {elapsed:>9.3f}s {rate:>12.0f} rows/s")
+        total_rows += count
+        total_time += elapsed
+    rate = total_rows / total_time if total_time > 0 else 0
+    print(f"  {'total':<20} {total_rows:>10} rows {total_time:>9.3f}s {rate:>12.0f} rows/s")
+
+    # ru_maxrss is reported in kilobytes on Linux.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"  peak RSS of the loader process: {peak_rss:.1f} MB")
+
+
+def generate_user_rows(task, context):
+    chunk_no, start, count = task
+    rng, fake = chunk_rng('users', chunk_no)
     users = []
-    user_count = max(5, 20 // SEED_COUNT)
 
-    for i in range(1, user_count + 1):
-        username = f'user{i}' if i > 1 else 'admin'
-        email = f'user{i}@example.com' if i > 1 else 'admin@example.com'
-        phone = f'+123456789{i:02d}'
-        password_hash = f'hashed_password_{i}'
+    for user_id in range(start + 1, start + count + 1):
+        username = f'user{user_id}' if user_id > 1 else 'admin'
+        email = f'user{user_id}@example.com' if user_id > 1 else 'admin@example.com'
+        phone = f'+123456789{user_id:02d}'
+        password_hash = f'hashed_password_{user_id}'
         registration_date = fake.date_time_between(start_date='-1y', end_date='now')
         last_login = fake.date_time_between(start_date=registration_date,
-                                            end_date='now') if random.random() > 0.2 else None
+                                            end_date='now') if rng.random() > 0.2 else None
         is_active = True
-        is_blocked = False if i > 1 else False
+        is_blocked = False if user_id > 1 else False
 
         users.append((
-            username, email, phone, password_hash,
+            user_id, username, email, phone, password_hash,
             registration_date, last_login, is_active, is_blocked
         ))
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO users 
-            (username, email, phone, password_hash, registration_date, last_login, is_active, is_blocked)
-            VALUES %s
-            """,
-            users
-        )
-    conn.commit()
+    return users
+
+
+def seed_users(conn):
+    print("Seeding users...")
+    user_count = scaled_count('users')
+
+    users = generate_rows(generate_user_rows, pending_chunks('users', chunk_counts(user_count)))
+
+    insert_rows(conn, 'users', (
+        'user_id', 'username', 'email', 'phone', 'password_hash', 'registration_date',
+        'last_login', 'is_active', 'is_blocked',
+    ), users)
+    sync_identity(conn, 'users', 'user_id')
+    register_keys('users', range(1, user_count + 1))
+
+
+def generate_user_profile_rows(task, context):
+    chunk_no, user_ids = task
+    np_rng = chunk_np_rng('user_profiles', chunk_no)
+    user_ids = np.asarray(user_ids)
+    count = len(user_ids)
+
+    first_names = sample_column(np_rng, text_pool('first_name', lambda fake: fake.first_name()), count)
+    last_names = sample_column(np_rng, text_pool('last_name', lambda fake: fake.last_name()), count)
+    avatar_urls = nullable(
+        np.array([f'https://example.com/avatars/{user_id}.jpg' for user_id in user_ids.tolist()], dtype=object),
+        np_rng.random(count) > 0.3,
+    )
+    about = nullable(
+        sample_column(np_rng, text_pool('about', lambda fake: fake.paragraph(nb_sentences=3)), count),
+        np_rng.random(count) > 0.4,
+    )
+    ratings = random_money(np_rng, 1, 5, count)
+
+    return column_rows(user_ids, first_names, last_names, avatar_urls, about, ratings)
 
 
 def seed_user_profiles(conn):
     print("Seeding user_profiles...")
-    profiles = []
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT user_id FROM users")
-        user_ids = [row[0] for row in cursor.fetchall()]
+    user_ids = registered_keys('users')
 
-    for user_id in user_ids:
-        first_name = fake.first_name()
-        last_name = fake.last_name()
-        avatar_url = f'https://example.com/avatars/{user_id}.jpg' if random.random() > 0.3 else None
-        about = fake.paragraph(nb_sentences=3) if random.random() > 0.4 else None
-        rating = round(random.uniform(1, 5), 2)
-
-        profiles.append((
-            user_id, first_name, last_name, avatar_url, about, rating
-        ))
+    profiles = generate_rows(generate_user_profile_rows, pending_chunks('user_profiles', chunk_items(user_ids)),
+                             parallel=True)
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO user_profiles 
-            (user_id, first_name, last_name, avatar_url, about, rating)
-            VALUES %s
-            """,
-            profiles
-        )
-    conn.commit()
+    insert_rows(conn, 'user_profiles', (
+        'user_id', 'first_name', 'last_name', 'avatar_url', 'about', 'rating',
+    ), profiles)
 
 
-def seed_password_resets(conn):
-    print("Seeding password_resets...")
+def generate_password_reset_rows(task, context):
+    chunk_no, user_ids = task
+    rng, _ = chunk_rng('password_resets', chunk_no)
     resets = []
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT user_id FROM users LIMIT %s", (max(2, 5 // SEED_COUNT),))
-        user_ids = [row[0] for row in cursor.fetchall()]
 
     for user_id in user_ids:
-        token = get_random_string(32)
+        token = get_random_string(rng, 32)
         expiration_date = datetime.now() + timedelta(hours=24)
-        is_used = random.choice([True, False])
+        is_used = rng.choice([True, False])
 
         resets.append((
             user_id, token, expiration_date, is_used
         ))
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO password_resets 
-            (user_id, token, expiration_date, is_used)
-            VALUES %s
-            """,
-            resets
-        )
-    conn.commit()
+    return resets
+
+
+def seed_password_resets(conn):
+    print("Seeding password_resets...")
+    user_ids = registered_keys('users')[:scaled_count('password_resets')]
+
+    resets = generate_rows(generate_password_reset_rows, pending_chunks('password_resets', chunk_items(user_ids)))
+
+    insert_rows(conn, 'password_resets', (
+        'user_id', 'token', 'expiration_date', 'is_used',
+    ), resets)
 
 
 def seed_ad_categories(conn):
@@ -148,17 +600,9 @@ def seed_ad_categories(conn):
         (4, 'Cleaning', 'Cleaning services'),
     ]
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO ad_categories 
-            (parent_id, name, description)
-            VALUES %s
-            """,
-            categories
-        )
-    conn.commit()
+    seed_lookup_table(conn, 'ad_categories', 'category_id', (
+        'parent_id', 'name', 'description',
+    ), categories)
 
 
 def seed_ad_statuses(conn):
@@ -171,39 +615,18 @@ def seed_ad_statuses(conn):
         ('Closed', 'Advertisement closed'),
     ]
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO ad_statuses 
-            (name, description)
-            VALUES %s
-            """,
-            statuses
-        )
-    conn.commit()
+    seed_lookup_table(conn, 'ad_statuses', 'status_id', (
+        'name', 'description',
+    ), statuses)
 
 
 def seed_ad_types(conn):
     print("Seeding ad_types...")
-    types = [
-        ('Product',),
-        ('Service',),
-        ('Job',),
-        ('Real Estate',),
-    ]
+    types = [(name,) for name in AD_TYPES]
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO ad_types 
-            (name)
-            VALUES %s
-            """,
-            types
-        )
-    conn.commit()
+    seed_lookup_table(conn, 'ad_types', 'type_id', (
+        'name',
+    ), types)
 
 
 def seed_locations(conn):
@@ -222,366 +645,408 @@ def seed_locations(conn):
         (5, 'San Francisco', 'city', None),
     ]
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO locations 
-            (parent_id, name, type, coordinates)
-            VALUES %s
-            """,
-            locations
-        )
-    conn.commit()
+    seed_lookup_table(conn, 'locations', 'location_id', (
+        'parent_id', 'name', 'type', 'coordinates',
+    ), locations)
 
 
-def seed_advertisements(conn):
-    print("Seeding advertisements...")
-    ads = []
+def generate_advertisement_rows(task, context):
+    chunk_no, start, count = task
+    np_rng = chunk_np_rng('advertisements', chunk_no)
+    now = np.datetime64(datetime.now(), 'us')
 
-    with conn.cursor() as cursor:
-        # Get required foreign keys
-        cursor.execute("SELECT user_id FROM users")
-        user_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT category_id FROM ad_categories")
-        category_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT location_id FROM locations")
-        location_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT status_id FROM ad_statuses")
-        status_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT type_id FROM ad_types")
-        type_ids = [row[0] for row in cursor.fetchall()]
-
-    ad_count = max(10, 50 // SEED_COUNT)
-
-    for i in range(1, ad_count + 1):
-        user_id = random.choice(user_ids)
-        category_id = random.choice(category_ids)
-        location_id = random.choice(location_ids)
-        status_id = random.choice(status_ids)
-        type_id = random.choice(type_ids)
-
-        title = fake.sentence(nb_words=6)[:100]
-        description = fake.paragraph(nb_sentences=5)
-        price = round(random.uniform(10, 10000), 2)
-        creation_date = fake.date_time_between(start_date='-6m', end_date='now')
-        modification_date = fake.date_time_between(start_date=creation_date,
-                                                   end_date='now') if random.random() > 0.5 else None
-        views_count = random.randint(0, 1000)
-
-        ads.append((
-            user_id, category_id, location_id, status_id, type_id,
-            title, description, price, creation_date, modification_date, views_count
-        ))
+    ad_ids = np.arange(start + 1, start + count + 1)
+    user_ids = skewed_keys(np_rng, context['user_ids'], count)
+    category_ids = random_keys(np_rng, context['category_ids'], count)
+    location_ids = random_keys(np_rng, context['location_ids'], count)
+    status_ids = random_keys(np_rng, context['status_ids'], count)
+    type_ids = random_keys(np_rng, context['type_ids'], count)
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO advertisements 
-            (user_id, category_id, location_id, status_id, type_id, 
-             title, description, price, creation_date, modification_date, views_count)
-            VALUES %s
-            """,
-            ads
-        )
-    conn.commit()
+    titles = sample_column(np_rng, text_pool('ad_title', lambda fake: fake.sentence(nb_words=6)[:100]), count)
+    descriptions = sample_column(np_rng, text_pool('ad_description', lambda fake: fake.paragraph(nb_sentences=5)),
+                                 count)
+    prices = random_money(np_rng, 10, 10000, count)
+    creation_dates = random_datetimes(np_rng, days_ago(now, 182), now, count)
+    modification_dates = nullable(
+        random_datetimes(np_rng, creation_dates, now, count),
+        np_rng.random(count) > 0.5,
+    )
+    views_counts = np_rng.integers(0, 1001, count)
+
+    return column_rows(
+        ad_ids, user_ids, category_ids, location_ids, status_ids, type_ids,
+        titles, descriptions, prices, creation_dates, modification_dates, views_counts
+    )
+
+
+def seed_advertisements(conn):
+    print("Seeding advertisements...")
+    ad_count = scaled_count('advertisements')
+
+    # Every chunk is generated, even when resuming, since later tables need the
+    # tracked attributes of all ads; committed chunks are skipped on insert.
+    ads = generate_rows(generate_advertisement_rows, chunk_counts(ad_count), {
+        'user_ids': registered_keys('users'),
+        'category_ids': registered_keys('ad_categories'),
+        'location_ids': registered_keys('locations'),
+        'status_ids': registered_keys('ad_statuses'),
+        'type_ids': registered_keys('ad_types'),
+    }, parallel=True)
+    ads = track_attributes('advertisements', ads, {
+        'user_id': (1, 'i'),
+        'type_id': (5, 'b'),
+        'price': (8, 'd'),
+    })
+
+    insert_rows(conn, 'advertisements', (
+        'ad_id', 'user_id', 'category_id', 'location_id', 'status_id', 'type_id',
+        'title', 'description', 'price', 'creation_date', 'modification_date', 'views_count',
+    ), ads)
+    sync_identity(conn, 'advertisements', 'ad_id')
+    register_keys('advertisements', range(1, ad_count + 1))
+
+
+def generate_ad_photo_rows(task, context):
+    chunk_no, ad_ids = task
+    np_rng = chunk_np_rng('ad_photos', chunk_no)
+    now = np.datetime64(datetime.now(), 'us')
+
+    photo_counts = np_rng.integers(1, MAX_PHOTOS_PER_AD + 1, len(ad_ids))
+    photo_ad_ids = np.repeat(np.asarray(ad_ids), photo_counts)
+    count = len(photo_ad_ids)
+    photo_numbers = np.arange(count) - np.repeat(np.cumsum(photo_counts) - photo_counts, photo_counts)
+
+    photo_urls = np.array([
+        f'https://example.com/ads/{ad_id}/photo_{i}.jpg'
+        for ad_id, i in zip(photo_ad_ids.tolist(), photo_numbers.tolist())
+    ], dtype=object)
+    is_main = photo_numbers == 0
+    upload_dates = random_datetimes(np_rng, days_ago(now, 182), now, count)
+
+    return column_rows(photo_ad_ids, photo_urls, is_main, upload_dates)
 
 
 def seed_ad_photos(conn):
     print("Seeding ad_photos...")
-    photos = []
+    ad_ids = registered_keys('advertisements')
 
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT ad_id FROM advertisements")
-        ad_ids = [row[0] for row in cursor.fetchall()]
+    photos = generate_rows(generate_ad_photo_rows, pending_chunks('ad_photos', chunk_items(ad_ids)))
 
-    for ad_id in ad_ids:
-        num_photos = random.randint(1, min(5, 5 // SEED_COUNT + 1))
-        for i in range(num_photos):
-            photo_url = f'https://example.com/ads/{ad_id}/photo_{i}.jpg'
-            is_main = (i == 0)
-            upload_date = fake.date_time_between(start_date='-6m', end_date='now')
+    insert_rows(conn, 'ad_photos', (
+        'ad_id', 'photo_url', 'is_main', 'upload_date',
+    ), photos)
 
-            photos.append((
-                ad_id, photo_url, is_main, upload_date
-            ))
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO ad_photos 
-            (ad_id, photo_url, is_main, upload_date)
-            VALUES %s
-            """,
-            photos
-        )
-    conn.commit()
+def iter_ads_of_type(type_name):
+    type_id = AD_TYPES.index(type_name) + 1
+    ad_ids = registered_keys('advertisements')
+    ad_types = KEY_ATTRIBUTES['advertisements']['type_id']
+    return chunk_items(ad_id for ad_id, ad_type in zip(ad_ids, ad_types) if ad_type == type_id)
 
 
-def seed_product_ads(conn):
-    print("Seeding product_ads...")
+def generate_product_ad_rows(task, context):
+    chunk_no, ad_ids = task
+    rng, fake = chunk_rng('product_ads', chunk_no)
     product_ads = []
 
-    with conn.cursor() as cursor:
-        cursor.execute("""
-            SELECT a.ad_id 
-            FROM advertisements a
-            JOIN ad_types t ON a.type_id = t.type_id
-            WHERE t.name = 'Product'
-        """)
-        ad_ids = [row[0] for row in cursor.fetchall()]
-
     for ad_id in ad_ids:
         brand = fake.company()[:50]
         model = fake.word()[:50]
-        condition = random.choice(['New', 'Used', 'Refurbished'])
-        warranty = random.choice([True, False])
+        condition = rng.choice(['New', 'Used', 'Refurbished'])
+        warranty = rng.choice([True, False])
 
         product_ads.append((
             ad_id, brand, model, condition, warranty
         ))
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO product_ads 
-            (ad_id, brand, model, condition, warranty)
-            VALUES %s
-            """,
-            product_ads
-        )
-    conn.commit()
+    return product_ads
 
 
-def seed_service_ads(conn):
-    print("Seeding service_ads...")
-    service_ads = []
+def seed_product_ads(conn):
+    print("Seeding product_ads...")
+    product_ads = generate_rows(generate_product_ad_rows,
+                                pending_chunks('product_ads', iter_ads_of_type('Product')))
 
-    with conn.cursor() as cursor:
-        cursor.execute("""
-            SELECT a.ad_id 
-            FROM advertisements a
-            JOIN ad_types t ON a.type_id = t.type_id
-            WHERE t.name = 'Service'
-        """)
-        ad_ids = [row[0] for row in cursor.fetchall()]
+    insert_rows(conn, 'product_ads', (
+        'ad_id', 'brand', 'model', 'condition', 'warranty',
+    ), product_ads)
+
+
+def generate_service_ad_rows(task, context):
+    chunk_no, ad_ids = task
+    rng, _ = chunk_rng('service_ads', chunk_no)
+    service_ads = []
 
     for ad_id in ad_ids:
-        service_type = random.choice(['Repair', 'Cleaning', 'Tutoring', 'Design', 'Transport'])
-        experience = random.choice(['<1 year', '1-3 years', '3-5 years', '5+ years'])
-        availability = random.choice(['Weekdays', 'Weekends', 'Flexible', 'On demand'])
+        service_type = rng.choice(['Repair', 'Cleaning', 'Tutoring', 'Design', 'Transport'])
+        experience = rng.choice(['<1 year', '1-3 years', '3-5 years', '5+ years'])
+        availability = rng.choice(['Weekdays', 'Weekends', 'Flexible', 'On demand'])
 
         service_ads.append((
             ad_id, service_type, experience, availability
         ))
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO service_ads 
-            (ad_id, service_type, experience, availability)
-            VALUES %s
-            """,
-            service_ads
-        )
-    conn.commit()
+    return service_ads
+
+
+def seed_service_ads(conn):
+    print("Seeding service_ads...")
+    service_ads = generate_rows(generate_service_ad_rows,
+                                pending_chunks('service_ads', iter_ads_of_type('Service')))
+
+    insert_rows(conn, 'service_ads', (
+        'ad_id', 'service_type', 'experience', 'availability',
+    ), service_ads)
+
+
+def generate_job_ad_rows(task, context):
+    chunk_no, ad_ids = task
+    np_rng = chunk_np_rng('job_ads', chunk_no)
+    ad_ids = np.asarray(ad_ids)
+    count = len(ad_ids)
+
+    positions = sample_column(np_rng, text_pool('job_position', lambda fake: fake.job()[:100]), count)
+    employment_types = sample_column(np_rng, ['Full-time', 'Part-time', 'Contract', 'Freelance'], count)
+    experience_required = sample_column(np_rng, ['Entry level', 'Mid level', 'Senior', 'Executive'], count)
+    salary_from = random_money(np_rng, 1000, 5000, count)
+    salary_to = np.round(salary_from + np_rng.uniform(1000, 10000, count), 2)
+
+    return column_rows(ad_ids, positions, employment_types, experience_required, salary_from, salary_to)
 
 
 def seed_job_ads(conn):
     print("Seeding job_ads...")
-    job_ads = []
+    job_ads = generate_rows(generate_job_ad_rows, pending_chunks('job_ads', iter_ads_of_type('Job')))
 
-    with conn.cursor() as cursor:
-        cursor.execute("""
-            SELECT a.ad_id 
-            FROM advertisements a
-            JOIN ad_types t ON a.type_id = t.type_id
-            WHERE t.name = 'Job'
-        """)
-        ad_ids = [row[0] for row in cursor.fetchall()]
+    insert_rows(conn, 'job_ads', (
+        'ad_id', 'position', 'employment_type', 'experience_required', 'salary_from',
+        'salary_to',
+    ), job_ads)
 
-    for ad_id in ad_ids:
-        position = fake.job()[:100]
-        employment_type = random.choice(['Full-time', 'Part-time', 'Contract', 'Freelance'])
-        experience_required = random.choice(['Entry level', 'Mid level', 'Senior', 'Executive'])
-        salary_from = round(random.uniform(1000, 5000), 2)
-        salary_to = round(salary_from + random.uniform(1000, 10000), 2)
-
-        job_ads.append((
-            ad_id, position, employment_type, experience_required, salary_from, salary_to
-        ))
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO job_ads 
-            (ad_id, position, employment_type, experience_required, salary_from, salary_to)
-            VALUES %s
-            """,
-            job_ads
-        )
-    conn.commit()
+def generate_real_estate_ad_rows(task, context):
+    chunk_no, ad_ids = task
+    np_rng = chunk_np_rng('real_estate_ads', chunk_no)
+    ad_ids = np.asarray(ad_ids)
+    count = len(ad_ids)
+
+    property_types = sample_column(np_rng, ['Apartment', 'House', 'Condo', 'Villa', 'Townhouse'], count)
+    areas = random_money(np_rng, 30, 300, count)
+    rooms = np_rng.integers(1, 6, count)
+    multi_storey = (property_types == 'Apartment') | (property_types == 'Condo')
+    floors = np.where(multi_storey, np_rng.integers(1, 26, count), 1)
+    total_floors = np.where(multi_storey, np_rng.integers(1, 31, count), 1)
+
+    return column_rows(ad_ids, property_types, areas, rooms, floors, total_floors)
 
 
 def seed_real_estate_ads(conn):
     print("Seeding real_estate_ads...")
-    real_estate_ads = []
+    real_estate_ads = generate_rows(generate_real_estate_ad_rows,
+                                    pending_chunks('real_estate_ads', iter_ads_of_type('Real Estate')))
 
-    with conn.cursor() as cursor:
-        cursor.execute("""
-            SELECT a.ad_id 
-            FROM advertisements a
-            JOIN ad_types t ON a.type_id = t.type_id
-            WHERE t.name = 'Real Estate'
-        """)
-        ad_ids = [row[0] for row in cursor.fetchall()]
+    insert_rows(conn, 'real_estate_ads', (
+        'ad_id', 'property_type', 'area', 'rooms', 'floor', 'total_floors',
+    ), real_estate_ads)
 
-    for ad_id in ad_ids:
-        property_type = random.choice(['Apartment', 'House', 'Condo', 'Villa', 'Townhouse'])
-        area = round(random.uniform(30, 300), 2)
-        rooms = random.randint(1, 5)
-        floor = random.randint(1, 25) if property_type == 'Apartment' or property_type == 'Condo' else 1
-        total_floors = random.randint(1, 30) if property_type == 'Apartment' or property_type == 'Condo' else 1
-
-        real_estate_ads.append((
-            ad_id, property_type, area, rooms, floor, total_floors
-        ))
-
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO real_estate_ads 
-            (ad_id, property_type, area, rooms, floor, total_floors)
-            VALUES %s
-            """,
-            real_estate_ads
-        )
-    conn.commit()
 
-
-def seed_conversations(conn):
-    print("Seeding conversations...")
+def generate_conversation_rows(task, context):
+    chunk_no, ad_ids = task
+    rng, fake = chunk_rng('conversations', chunk_no)
     conversations = []
 
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT ad_id FROM advertisements")
-        ad_ids = [row[0] for row in cursor.fetchall()]
-
-    conversation_count = max(5, 20 // SEED_COUNT)
-    for ad_id in random.sample(ad_ids, min(conversation_count, len(ad_ids))):
+    for conversation_id, ad_id in enumerate(ad_ids, chunk_no * SEED_CHUNK_SIZE + 1):
         start_date = fake.date_time_between(start_date='-3m', end_date='now')
         last_message_date = fake.date_time_between(start_date=start_date,
-                                                   end_date='now') if random.random() > 0.3 else None
+                                                   end_date='now') if rng.random() > 0.3 else None
 
         conversations.append((
-            ad_id, start_date, last_message_date
+            conversation_id, ad_id, start_date, last_message_date
         ))
 
+    return conversations
+
+
+def seed_conversations(conn):
+    print("Seeding conversations...")
+    rng, _ = table_rng('conversations')
+    ad_ids = registered_keys('advertisements')
+
+    if SEED_SKEW > 0:
+        # Hot ads attract many conversations, so draw with replacement.
+        conversation_count = scaled_count('conversations') if ad_ids else 0
+        discussed_ads = iter_skewed_keys('conversations', ad_ids, conversation_count)
+    else:
+        conversation_count = min(scaled_count('conversations'), len(ad_ids))
+        discussed_ads = sample_distinct(rng, ad_ids, conversation_count)
+
+    conversations = generate_rows(generate_conversation_rows,
+                                  pending_chunks('conversations', chunk_items(discussed_ads)))
+
+    insert_rows(conn, 'conversations', (
+        'conversation_id', 'ad_id', 'start_date', 'last_message_date',
+    ), conversations)
+    sync_identity(conn, 'conversations', 'conversation_id')
+    register_keys('conversations', range(1, conversation_count + 1))
+
+
+def generate_message_rows(task, context):
+    chunk_no, conversation_ids = task
+    np_rng = chunk_np_rng('messages', chunk_no)
+    now = np.datetime64(datetime.now(), 'us')
+    user_ids = context['user_ids']
+    conversation_count = len(conversation_ids)
+
+    # Each conversation is between two distinct users who take turns sending.
+    senders = random_keys(np_rng, user_ids, conversation_count)
+    recipients = user_ids.start + (
+        senders - user_ids.start + np_rng.integers(1, len(user_ids), conversation_count)
+    ) % len(user_ids)
+    message_counts = np_rng.integers(1, MAX_MESSAGES_PER_CONVERSATION + 1, conversation_count)
+
+    message_conversations = np.repeat(np.asarray(conversation_ids), message_counts)
+    count = len(message_conversations)
+    positions = np.arange(count) - np.repeat(np.cumsum(message_counts) - message_counts, message_counts)
+    replies = positions % 2 == 1
+    message_senders = np.where(replies, np.repeat(recipients, message_counts), np.repeat(senders, message_counts))
+    message_recipients = np.where(replies, np.repeat(senders, message_counts), np.repeat(recipients, message_counts))
+
+    contents = sample_column(np_rng, text_pool(
+        'message_content', lambda fake: fake.sentence(nb_words=fake.random_int(5, 20))
+    ), count)
+    send_dates = bursty_datetimes(np_rng, days_ago(now, MESSAGE_HISTORY_DAYS), now, count)
+    is_read = np_rng.random(count) < 0.5
+
+    return column_rows(
+        message_senders, message_recipients, message_conversations, contents, send_dates, is_read
+    )
+
+
+def create_partitions(conn, table, start, end):
+    # Monthly partitions for the rows about to be loaded (see migration V7);
+    # nothing happens for a table that is not partitioned.
     with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO conversations 
-            (ad_id, start_date, last_message_date)
-            VALUES %s
-            """,
-            conversations
-        )
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", (table,))
+        if cursor.fetchone():
+            cursor.execute("SELECT create_monthly_partitions(%s, %s, %s)",
+                           (table, start.date(), end.date() + timedelta(days=1)))
     conn.commit()
 
 
-def seed_messages(conn):
-    print("Seeding messages...")
-    messages = []
-
+def route_default_partitions(conn):
+    # Rows outside the prepared partitions (say, a cached dataset generated
+    # weeks ago) land in the default partition. Creating partitions for the
+    # months they span moves them out, so queries on those months prune again.
     with conn.cursor() as cursor:
-        cursor.execute("SELECT conversation_id FROM conversations")
-        conversation_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""
+            SELECT p.partrelid::regclass::text, p.partdefid::regclass::text, a.attname
+            FROM pg_partitioned_table p
+            JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+            WHERE p.partdefid <> 0
+        """)
+        for table, default_partition, key in cursor.fetchall():
+            cursor.execute(f"SELECT MIN({key}), MAX({key}), COUNT(*) FROM {default_partition}")
+            start, end, count = cursor.fetchone()
+            if not count:
+                continue
+            print(f"Moving {count} rows of {table} out of {default_partition}")
+            cursor.execute("SELECT create_monthly_partitions(%s, %s, %s)",
+                           (table, start.date(), end.date() + timedelta(days=1)))
+    conn.commit()
 
-        cursor.execute("SELECT user_id FROM users")
-        user_ids = [row[0] for row in cursor.fetchall()]
 
-    for conversation_id in conversation_ids:
-        num_messages = random.randint(1, max(3, 10 // SEED_COUNT))
-        participants = random.sample(user_ids, 2)
-        sender, recipient = participants[0], participants[1]
+def refresh_aggregate_views(conn):
+    # The materialized views of migration V8 were built over empty tables.
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regproc('refresh_aggregate_views')")
+        if cursor.fetchone()[0]:
+            print("Refreshing aggregate views...")
+            cursor.execute("SELECT refresh_aggregate_views()")
+    conn.commit()
 
-        for i in range(num_messages):
-            if i % 2 == 0:
-                current_sender = sender
-                current_recipient = recipient
-            else:
-                current_sender = recipient
-                current_recipient = sender
 
-            content = fake.sentence(nb_words=random.randint(5, 20))
-            send_date = fake.date_time_between(start_date='-3m', end_date='now')
-            is_read = random.choice([True, False])
+def suspend_counters(conn):
+    # Counter triggers of migration V9 would have parallel loads of messages,
+    # reviews and ads queue up (or deadlock) on the same users rows; the
+    # counters are recounted once after loading instead.
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regproc('set_counter_triggers')")
+        if cursor.fetchone()[0]:
+            cursor.execute("SELECT set_counter_triggers(false)")
+    conn.commit()
 
-            messages.append((
-                current_sender, current_recipient, conversation_id, content, send_date, is_read
-            ))
 
+def recount_counters(conn):
     with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO messages 
-            (sender_id, recipient_id, conversation_id, content, send_date, is_read)
-            VALUES %s
-            """,
-            messages
-        )
+        cursor.execute("SELECT to_regproc('recount_counters')")
+        if cursor.fetchone()[0]:
+            print("Recounting counter columns...")
+            cursor.execute("SELECT recount_counters()")
+            cursor.execute("SELECT set_counter_triggers(true)")
     conn.commit()
 
 
-def seed_reviews(conn):
-    print("Seeding reviews...")
-    reviews = []
+def seed_messages(conn):
+    print("Seeding messages...")
+    conversation_ids = registered_keys('conversations')
+
+    now = datetime.now()
+    create_partitions(conn, 'messages', now - timedelta(days=MESSAGE_HISTORY_DAYS), now)
+    messages = generate_rows(generate_message_rows, pending_chunks('messages', chunk_items(conversation_ids)), {
+        'user_ids': registered_keys('users'),
+    }, parallel=True)
+
+    insert_rows(conn, 'messages', (
+        'sender_id', 'recipient_id', 'conversation_id', 'content', 'send_date', 'is_read',
+    ), messages)
 
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT user_id FROM users")
-        user_ids = [row[0] for row in cursor.fetchall()]
 
-        cursor.execute("SELECT ad_id, user_id FROM advertisements")
-        ad_user_pairs = [(row[0], row[1]) for row in cursor.fetchall()]
+def generate_review_rows(task, context):
+    chunk_no, reviewed_ads = task
+    rng, fake = chunk_rng('reviews', chunk_no)
+    reviews = []
 
-    review_count = max(5, 30 // SEED_COUNT)
-    for ad_id, seller_id in random.sample(ad_user_pairs, min(review_count, len(ad_user_pairs))):
-        possible_reviewers = [uid for uid in user_ids if uid != seller_id]
-        if not possible_reviewers:
+    for ad_id, seller_id, _ in reviewed_ads:
+        reviewer_id = choice_except(rng, context['user_ids'], seller_id)
+        if reviewer_id is None:
             continue
 
-        reviewer_id = random.choice(possible_reviewers)
-        rating = random.randint(1, 5)
-        comment = fake.paragraph(nb_sentences=2) if random.random() > 0.3 else None
+        rating = rng.randint(1, 5)
+        comment = fake.paragraph(nb_sentences=2) if rng.random() > 0.3 else None
         creation_date = fake.date_time_between(start_date='-3m', end_date='now')
 
         reviews.append((
             reviewer_id, seller_id, ad_id, rating, comment, creation_date
         ))
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO reviews 
-            (reviewer_id, reviewed_user_id, ad_id, rating, comment, creation_date)
-            VALUES %s
-            """,
-            reviews
-        )
-    conn.commit()
+    return reviews
+
+
+def iter_sampled_ad_chunks(rng, count):
+    ad_ids = registered_keys('advertisements')
+    for chunk_no, chunk in chunk_items(sample_distinct(rng, ad_ids, count)):
+        yield chunk_no, [
+            (ad_id,
+             key_attribute('advertisements', 'user_id', ad_id),
+             key_attribute('advertisements', 'price', ad_id))
+            for ad_id in chunk
+        ]
+
+
+def seed_reviews(conn):
+    print("Seeding reviews...")
+    rng, _ = table_rng('reviews')
+
+    review_count = scaled_count('reviews')
+    reviewed_ads = pending_chunks('reviews', iter_sampled_ad_chunks(rng, review_count))
+
+    reviews = generate_rows(generate_review_rows, reviewed_ads, {
+        'user_ids': registered_keys('users'),
+    }, parallel=True)
+
+    insert_rows(conn, 'reviews', (
+        'reviewer_id', 'reviewed_user_id', 'ad_id', 'rating', 'comment', 'creation_date',
+    ), reviews)
 
 
 def seed_complaint_types(conn):
@@ -594,40 +1059,22 @@ def seed_complaint_types(conn):
         ('Duplicate', 'Duplicate advertisement'),
     ]
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO complaint_types 
-            (name, description)
-            VALUES %s
-            """,
-            complaint_types
-        )
-    conn.commit()
+    seed_lookup_table(conn, 'complaint_types', 'type_id', (
+        'name', 'description',
+    ), complaint_types)
 
 
-def seed_complaints(conn):
-    print("Seeding complaints...")
+def generate_complaint_rows(task, context):
+    chunk_no, _, count = task
+    rng, fake = chunk_rng('complaints', chunk_no)
     complaints = []
 
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT type_id FROM complaint_types")
-        type_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT user_id FROM users")
-        user_ids = [row[0] for row in cursor.fetchall()]
-
-        cursor.execute("SELECT ad_id FROM advertisements")
-        ad_ids = [row[0] for row in cursor.fetchall()]
-
-    complaint_count = max(3, 15 // SEED_COUNT)
-    for _ in range(complaint_count):
-        reporter_id = random.choice(user_ids)
-        ad_id = random.choice(ad_ids)
-        complaint_type_id = random.choice(type_ids)
+    for _ in range(count):
+        reporter_id = rng.choice(context['user_ids'])
+        ad_id = rng.choice(context['ad_ids'])
+        complaint_type_id = rng.choice(context['type_ids'])
         description = fake.paragraph(nb_sentences=2)
-        status = random.choice(['Pending', 'Resolved', 'Rejected'])
+        status = rng.choice(['Pending', 'Resolved', 'Rejected'])
         creation_date = fake.date_time_between(start_date='-2m', end_date='now')
         resolution_date = fake.date_time_between(start_date=creation_date,
                                                  end_date='now') if status == 'Resolved' else None
@@ -636,46 +1083,40 @@ def seed_complaints(conn):
             reporter_id, ad_id, complaint_type_id, description, status, creation_date, resolution_date
         ))
 
-    with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO complaints 
-            (reporter_id, ad_id, complaint_type_id, description, status, creation_date, resolution_date)
-            VALUES %s
-            """,
-            complaints
-        )
-    conn.commit()
+    return complaints
 
 
-def seed_safe_deals(conn):
-    print("Seeding safe_deals...")
-    safe_deals = []
+def seed_complaints(conn):
+    print("Seeding complaints...")
+    complaint_count = scaled_count('complaints')
 
-    with conn.cursor() as cursor:
-        cursor.execute("SELECT user_id FROM users")
-        user_ids = [row[0] for row in cursor.fetchall()]
+    complaint_chunks = pending_chunks('complaints', chunk_counts(complaint_count))
+    complaints = generate_rows(generate_complaint_rows, complaint_chunks, {
+        'type_ids': registered_keys('complaint_types'),
+        'user_ids': registered_keys('users'),
+        'ad_ids': registered_keys('advertisements'),
+    })
 
-        cursor.execute("SELECT ad_id, user_id FROM advertisements")
-        ad_seller_pairs = [(row[0], row[1]) for row in cursor.fetchall()]
+    insert_rows(conn, 'complaints', (
+        'reporter_id', 'ad_id', 'complaint_type_id', 'description', 'status',
+        'creation_date', 'resolution_date',
+    ), complaints)
 
-    deal_count = max(3, 10 // SEED_COUNT)
-    for ad_id, seller_id in random.sample(ad_seller_pairs, min(deal_count, len(ad_seller_pairs))):
-        possible_buyers = [uid for uid in user_ids if uid != seller_id]
-        if not possible_buyers:
-            continue
 
-        buyer_id = random.choice(possible_buyers)
+def generate_safe_deal_rows(task, context):
+    chunk_no, deal_ads = task
+    rng, fake = chunk_rng('safe_deals', chunk_no)
+    safe_deals = []
 
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT price FROM advertisements WHERE ad_id = %s", (ad_id,))
-            price = cursor.fetchone()[0]
+    for ad_id, seller_id, price in deal_ads:
+        buyer_id = choice_except(rng, context['user_ids'], seller_id)
+        if buyer_id is None:
+            continue
 
         # Fixed line - using Solution 1
-        amount = round(float(price) * random.uniform(0.9, 1.1), 2)
+        amount = round(float(price) * rng.uniform(0.9, 1.1), 2)
 
-        status = random.choice(['Pending', 'Completed', 'Cancelled'])
+        status = rng.choice(['Pending', 'Completed', 'Cancelled'])
         creation_date = fake.date_time_between(start_date='-1m', end_date='now')
         completion_date = fake.date_time_between(start_date=creation_date,
                                                  end_date='now') if status == 'Completed' else None
@@ -684,88 +1125,464 @@ def seed_safe_deals(conn):
             buyer_id, seller_id, ad_id, amount, status, creation_date, completion_date
         ))
 
+    return safe_deals
+
+
+def seed_safe_deals(conn):
+    print("Seeding safe_deals...")
+    rng, _ = table_rng('safe_deals')
+
+    deal_count = scaled_count('safe_deals')
+    deal_ads = pending_chunks('safe_deals', iter_sampled_ad_chunks(rng, deal_count))
+
+    safe_deals = generate_rows(generate_safe_deal_rows, deal_ads, {
+        'user_ids': registered_keys('users'),
+    })
+
+    insert_rows(conn, 'safe_deals', (
+        'buyer_id', 'seller_id', 'ad_id', 'amount', 'status', 'creation_date',
+        'completion_date',
+    ), safe_deals)
+
+
+# table -> (seed function, tables it references), following the FKs in V1-V4.
+SEED_TABLES = {
+    'users': (seed_users, ()),
+    'user_profiles': (seed_user_profiles, ('users',)),
+    'password_resets': (seed_password_resets, ('users',)),
+    'ad_categories': (seed_ad_categories, ()),
+    'ad_statuses': (seed_ad_statuses, ()),
+    'ad_types': (seed_ad_types, ()),
+    'locations': (seed_locations, ()),
+    'advertisements': (seed_advertisements, (
+        'users', 'ad_categories', 'ad_statuses', 'ad_types', 'locations',
+    )),
+    'ad_photos': (seed_ad_photos, ('advertisements',)),
+    'product_ads': (seed_product_ads, ('advertisements', 'ad_types')),
+    'service_ads': (seed_service_ads, ('advertisements', 'ad_types')),
+    'job_ads': (seed_job_ads, ('advertisements', 'ad_types')),
+    'real_estate_ads': (seed_real_estate_ads, ('advertisements', 'ad_types')),
+    'conversations': (seed_conversations, ('advertisements',)),
+    'messages': (seed_messages, ('conversations', 'users')),
+    'reviews': (seed_reviews, ('users', 'advertisements')),
+    'complaint_types': (seed_complaint_types, ()),
+    'complaints': (seed_complaints, ('users', 'advertisements', 'complaint_types')),
+    'safe_deals': (seed_safe_deals, ('users', 'advertisements')),
+}
+
+
+def seed_table(table):
+    seed_function, _ = SEED_TABLES[table]
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        seed_function(conn)
+    finally:
+        conn.close()
+
+
+def run_seed_schedule(tables, seed=seed_table):
+    # A table is started as soon as every table it references has been seeded
+    # (or does not exist at the current MIGRATION_VERSION).
+    pending = {
+        table: {dep for dep in SEED_TABLES[table][1] if dep in tables}
+        for table in SEED_TABLES if table in tables
+    }
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=SEED_CONNECTIONS) as executor:
+        while pending or running:
+            for table in [t for t, deps in pending.items() if not deps]:
+                del pending[table]
+                running[executor.submit(seed, table)] = table
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                table = running.pop(future)
+                future.result()
+                for deps in pending.values():
+                    deps.discard(table)
+
+
+def dataset_cache_key(tables):
+    # Seed, scale and migration version name the dataset; every other setting
+    # that changes the generated rows goes into the digest.
+    settings = {
+        'seed': SEED_RANDOM_SEED,
+        'scale': SEED_SCALE,
+        'migration_version': MIGRATION_VERSION,
+        'tables': sorted(set(tables) & set(SEED_TABLES)),
+        'chunk_size': SEED_CHUNK_SIZE,
+        'text_pool_size': TEXT_POOL_SIZE,
+        'skew': SEED_SKEW,
+        'bursts': [SEED_BURSTS, SEED_BURST_SHARE, SEED_BURST_HOURS],
+    }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+    return f"seed{SEED_RANDOM_SEED}-scale{SEED_SCALE:g}-v{MIGRATION_VERSION}-{digest[:12]}"
+
+
+def read_dataset_cache(key):
+    # A dataset only gets its manifest once every table was written.
+    try:
+        with open(os.path.join(SEED_CACHE_DIR, key, 'manifest.json')) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+
+def cache_rows(table, columns, rows):
+    with CACHE_LOCK:
+        entry = DATASET_CACHE['tables'].get(table)
+        if entry is None:
+            path = os.path.join(DATASET_CACHE['path'], f'{table}.copy.gz')
+            entry = DATASET_CACHE['tables'][table] = {
+                'columns': list(columns),
+                'rows': 0,
+                'file': gzip.open(path, 'wt', encoding='utf-8', compresslevel=1),
+            }
+    entry['file'].write(''.join(map(copy_line, rows)))
+    entry['rows'] += len(rows)
+
+
+def generate_dataset(tables, key):
+    if not SEED_CACHE_DIR or COMPLETED_CHUNKS:
+        # A resumed run only sees part of the rows, so it cannot fill the cache.
+        run_seed_schedule(tables)
+        return
+
+    # Written under a temporary name and renamed when complete, so a crashed
+    # run never leaves a dataset that looks replayable.
+    path = os.path.join(SEED_CACHE_DIR, key)
+    partial_path = path + '.partial'
+    shutil.rmtree(partial_path, ignore_errors=True)
+    os.makedirs(partial_path)
+    DATASET_CACHE.update(path=partial_path, tables={})
+    try:
+        run_seed_schedule(tables)
+    finally:
+        cached_tables = DATASET_CACHE.pop('tables')
+        DATASET_CACHE.clear()
+        for entry in cached_tables.values():
+            entry['file'].close()
+
+    # Insertion order is a valid load order: a table's first rows are only
+    # cached after all of its parents were seeded.
+    manifest = {
+        'key': key,
+        'tables': [
+            {
+                'table': table,
+                'columns': entry['columns'],
+                'rows': entry['rows'],
+                'identity_key': IDENTITY_KEYS.get(table),
+            }
+            for table, entry in cached_tables.items()
+        ],
+    }
+    with open(os.path.join(partial_path, 'manifest.json'), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(partial_path, path)
+    print(f"Cached dataset {key} in {SEED_CACHE_DIR}")
+
+
+def replay_table(path, entry):
+    table = entry['table']
+    if WHOLE_TABLE in COMPLETED_CHUNKS.get(table, ()):
+        return
+    start_time = time.perf_counter()
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor, \
+                gzip.open(os.path.join(path, f'{table}.copy.gz'), 'rt', encoding='utf-8') as cache_file:
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(entry['columns'])}) FROM STDIN",
+                cache_file,
+                size=COPY_BUFFER_BYTES
+            )
+            mark_chunk(cursor, table, WHOLE_TABLE, entry['rows'])
+        conn.commit()
+        if entry['identity_key']:
+            sync_identity(conn, table, entry['identity_key'])
+    finally:
+        conn.close()
+    record_load(table, entry['rows'], time.perf_counter() - start_time, 'cache')
+
+
+def replay_dataset_cache(key, manifest):
+    print(f"Replaying cached dataset {key}")
+    path = os.path.join(SEED_CACHE_DIR, key)
+    entries = {entry['table']: entry for entry in manifest['tables']}
+    run_seed_schedule(set(entries), lambda table: replay_table(path, entries[table]))
+
+
+def load_checkpoints(conn, key):
     with conn.cursor() as cursor:
-        execute_values(
-            cursor,
-            """
-            INSERT INTO safe_deals 
-            (buyer_id, seller_id, ad_id, amount, status, creation_date, completion_date)
-            VALUES %s
-            """,
-            safe_deals
-        )
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS seed_checkpoints (
+                dataset_key TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                chunk_no INTEGER NOT NULL,
+                rows INTEGER NOT NULL,
+                completed_at TIMESTAMP NOT NULL DEFAULT now(),
+                PRIMARY KEY (table_name, chunk_no)
+            )
+        """)
+        cursor.execute("SELECT DISTINCT dataset_key FROM seed_checkpoints WHERE dataset_key <> %s", (key,))
+        other_keys = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT table_name, chunk_no FROM seed_checkpoints WHERE dataset_key = %s", (key,))
+        checkpoints = cursor.fetchall()
     conn.commit()
 
+    if other_keys:
+        raise ValueError(
+            f"database was seeded with other settings ({', '.join(other_keys)}); "
+            f"reset it or restore them to resume"
+        )
 
-def seed_database():
-    conn = None
-    try:
-        conn = psycopg2.connect(**DB_PARAMS)
+    COMPLETED_CHUNKS.clear()
+    for table, chunk_no in checkpoints:
+        COMPLETED_CHUNKS.setdefault(table, set()).add(chunk_no)
+    CHECKPOINT['key'] = key
+    if checkpoints:
+        print(f"Resuming {key}: {len(checkpoints)} chunks of {len(COMPLETED_CHUNKS)} tables already seeded")
 
-        if check_table_exists(conn, 'users'):
-            seed_users(conn)
 
-        if check_table_exists(conn, 'user_profiles'):
-            seed_user_profiles(conn)
+def mark_chunk(cursor, table, chunk_no, rows):
+    cursor.execute("""
+        INSERT INTO seed_checkpoints (dataset_key, table_name, chunk_no, rows)
+        VALUES (%s, %s, %s, %s)
+    """, (CHECKPOINT['key'], table, chunk_no, rows))
 
-        if check_table_exists(conn, 'password_resets'):
-            seed_password_resets(conn)
 
-        if check_table_exists(conn, 'ad_categories'):
-            seed_ad_categories(conn)
+def ensure_deferred_ddl_table(conn):
+    # Definitions are kept in the database rather than in memory, so objects
+    # dropped by a fast load that later crashed are rebuilt by the next run.
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS seed_deferred_ddl (
+                table_name TEXT NOT NULL,
+                object_name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                definition TEXT NOT NULL,
+                PRIMARY KEY (table_name, object_name)
+            )
+        """)
+    conn.commit()
+
+
+def defer_indexes_and_foreign_keys(conn, tables):
+    # Primary keys and unique constraints stay: FKs need them on rebuild and
+    # they guard the explicitly assigned keys against duplicates. Indexes of a
+    # partitioned table come back as ON ONLY, which would rebuild just the
+    # parent; without it they are built on every partition again.
+    tables = sorted(set(tables) & set(SEED_TABLES))
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO seed_deferred_ddl (table_name, object_name, kind, definition)
+            SELECT t.relname, ic.relname, 'index', replace(pg_get_indexdef(i.indexrelid), ' ON ONLY ', ' ON ')
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            JOIN pg_class t ON t.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            WHERE n.nspname = 'public'
+            AND t.relname = ANY(%(tables)s)
+            AND NOT EXISTS (
+                SELECT 1 FROM pg_constraint c
+                WHERE c.conindid = i.indexrelid AND c.contype IN ('p', 'u', 'x')
+            )
+            UNION ALL
+            SELECT t.relname, c.conname, 'foreign_key', pg_get_constraintdef(c.oid)
+            FROM pg_constraint c
+            JOIN pg_class t ON t.oid = c.conrelid
+            JOIN pg_namespace n ON n.oid = t.relnamespace
+            WHERE n.nspname = 'public'
+            AND c.contype = 'f'
+            AND t.relname = ANY(%(tables)s)
+            ON CONFLICT DO NOTHING
+        """, {'tables': tables})
+
+        cursor.execute("SELECT table_name, object_name, kind FROM seed_deferred_ddl ORDER BY kind")
+        deferred = cursor.fetchall()
+        for table, name, kind in deferred:
+            if kind == 'foreign_key':
+                cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}")
+            else:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
 
-        if check_table_exists(conn, 'ad_statuses'):
-            seed_ad_statuses(conn)
+    indexes = sum(1 for _, _, kind in deferred if kind == 'index')
+    print(f"Fast load: deferred {indexes} indexes and {len(deferred) - indexes} foreign keys")
 
-        if check_table_exists(conn, 'ad_types'):
-            seed_ad_types(conn)
 
-        if check_table_exists(conn, 'locations'):
-            seed_locations(conn)
+def run_deferred_ddl(table, statements):
+    # Each task gets its own connection; the deferred_ddl row is deleted in the
+    # same transaction as the DDL, so an interrupted rebuild resumes cleanly.
+    start_time = time.perf_counter()
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET max_parallel_maintenance_workers = %s", (SEED_INDEX_WORKERS,))
+            cursor.execute("SET maintenance_work_mem = %s", (SEED_MAINTENANCE_WORK_MEM,))
+            for name, statement in statements:
+                cursor.execute(statement)
+                cursor.execute("""
+                    DELETE FROM seed_deferred_ddl WHERE table_name = %s AND object_name = %s
+                """, (table, name))
+                conn.commit()
+    finally:
+        conn.close()
+    return table, time.perf_counter() - start_time
 
-        if check_table_exists(conn, 'advertisements'):
-            seed_advertisements(conn)
 
-        if check_table_exists(conn, 'ad_photos'):
-            seed_ad_photos(conn)
+def run_deferred_ddl_tasks(tasks):
+    timings = {}
+    with ThreadPoolExecutor(max_workers=SEED_CONNECTIONS) as executor:
+        futures = [executor.submit(run_deferred_ddl, table, statements) for table, statements in tasks]
+        for future in futures:
+            table, elapsed = future.result()
+            timings[table] = timings.get(table, 0.0) + elapsed
+    return timings
 
-        if check_table_exists(conn, 'product_ads'):
-            seed_product_ads(conn)
 
-        if check_table_exists(conn, 'service_ads'):
-            seed_service_ads(conn)
+def rebuild_deferred_ddl(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT table_name, object_name, kind, definition FROM seed_deferred_ddl")
+        deferred = cursor.fetchall()
+    if not deferred:
+        return 0.0
+
+    print(f"Rebuilding {len(deferred)} deferred indexes and foreign keys...")
+    start_time = time.perf_counter()
+
+    # Index builds only take SHARE locks, so every index can be built at once,
+    # each with parallel maintenance workers.
+    index_timings = run_deferred_ddl_tasks([
+        (table, [(name, definition)])
+        for table, name, kind, definition in deferred if kind == 'index'
+    ])
+
+    # FKs come back NOT VALID (a brief lock, no scan) and are validated
+    # afterwards. VALIDATE conflicts with itself on the same table, so the
+    # validations run one table per connection. Partitioned tables do not
+    # support NOT VALID FKs; theirs are added and checked in one step there.
+    foreign_keys = {}
+    with conn.cursor() as cursor:
+        for table, name, kind, definition in deferred:
+            if kind != 'foreign_key':
+                continue
+            cursor.execute("""
+                SELECT c.relkind = 'p', EXISTS (
+                    SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = c.oid
+                )
+                FROM pg_class c WHERE c.oid = %s::regclass
+            """, (name, table))
+            partitioned, exists = cursor.fetchone()
+            if partitioned and not exists:
+                foreign_keys.setdefault(table, []).append(
+                    (name, f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+                )
+                continue
+            if not exists:
+                cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID")
+            foreign_keys.setdefault(table, []).append(
+                (name, f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+            )
+    conn.commit()
+    validation_timings = run_deferred_ddl_tasks(foreign_keys.items())
 
-        if check_table_exists(conn, 'job_ads'):
-            seed_job_ads(conn)
+    elapsed = time.perf_counter() - start_time
+    for table in sorted(set(index_timings) | set(validation_timings)):
+        print(f"  {table:<20} indexes {index_timings.get(table, 0.0):>9.3f}s"
+              f"  foreign keys {validation_timings.get(table, 0.0):>9.3f}s")
+    print(f"  rebuild wall time: {elapsed:.3f}s")
+    return elapsed
 
-        if check_table_exists(conn, 'real_estate_ads'):
-            seed_real_estate_ads(conn)
 
-        if check_table_exists(conn, 'conversations'):
-            seed_conversations(conn)
+def report_load_mode(loader, load_seconds, rebuild_seconds):
+    # Keep the last timing of each mode per data size and loader, so a fast
+    # load can be compared with loading the same rows into indexed tables.
+    total_rows = sum(count for count, _ in LOAD_STATS.values())
+    mode = 'fast' if SEED_FAST_LOAD else 'indexed'
+    try:
+        with open(SEED_REPORT_FILE) as report_file:
+            report = json.load(report_file)
+    except (OSError, ValueError):
+        report = {}
 
-        if check_table_exists(conn, 'messages'):
-            seed_messages(conn)
+    runs = report.setdefault(f'{total_rows} rows, {loader}', {})
+    runs[mode] = {'load_seconds': load_seconds, 'rebuild_seconds': rebuild_seconds}
+    try:
+        with open(SEED_REPORT_FILE, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    except OSError as e:
+        print(f"Could not write {SEED_REPORT_FILE}: {e}")
 
-        if check_table_exists(conn, 'reviews'):
-            seed_reviews(conn)
+    total = load_seconds + rebuild_seconds
+    print(f"Load wall time ({mode}): {load_seconds:.3f}s load + {rebuild_seconds:.3f}s rebuild = {total:.3f}s")
+    if 'fast' in runs and 'indexed' in runs:
+        fast = runs['fast']['load_seconds'] + runs['fast']['rebuild_seconds']
+        indexed = runs['indexed']['load_seconds'] + runs['indexed']['rebuild_seconds']
+        print(f"Fast load vs indexed load of {total_rows} rows ({loader}): {fast:.3f}s vs {indexed:.3f}s "
+              f"(saved {indexed - fast:.3f}s)")
 
-        if check_table_exists(conn, 'complaint_types'):
-            seed_complaint_types(conn)
 
-        if check_table_exists(conn, 'complaints'):
-            seed_complaints(conn)
+def seed_database():
+    if SEED_LOADER not in LOADERS:
+        raise ValueError(f"SEED_LOADER must be one of {LOADERS}, got {SEED_LOADER!r}")
 
-        if check_table_exists(conn, 'safe_deals'):
-            seed_safe_deals(conn)
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            tables = fetch_existing_tables(conn)
+            ensure_deferred_ddl_table(conn)
+            # Checkpoints of another dataset stop the run here, before any
+            # trigger is disabled or index dropped.
+            key = dataset_cache_key(tables)
+            load_checkpoints(conn, key)
+
+            suspend_counters(conn)
+            try:
+                try:
+                    if SEED_FAST_LOAD:
+                        defer_indexes_and_foreign_keys(conn, tables)
+
+                    # A partly generated database is finished by generating, not from
+                    # the cache; a partly replayed one only has WHOLE_TABLE checkpoints.
+                    resuming_generation = any(
+                        chunks - {WHOLE_TABLE} for chunks in COMPLETED_CHUNKS.values()
+                    )
+                    manifest = read_dataset_cache(key) if SEED_CACHE_DIR and not resuming_generation else None
+
+                    start_time = time.perf_counter()
+                    if manifest:
+                        replay_dataset_cache(key, manifest)
+                    else:
+                        generate_dataset(tables, key)
+                    load_seconds = time.perf_counter() - start_time
+
+                    route_default_partitions(conn)
+                finally:
+                    # A failed load still gets its indexes and foreign keys
+                    # back; the checkpoints let the next run resume the rows.
+                    conn.rollback()
+                    rebuild_seconds = rebuild_deferred_ddl(conn)
+            finally:
+                # However the load ended, the counter triggers come back on,
+                # recounted over the rows that made it in.
+                conn.rollback()
+                recount_counters(conn)
+            refresh_aggregate_views(conn)
+        finally:
+            conn.close()
 
+        loader = 'cache' if manifest else SEED_LOADER
+        print_load_summary(loader)
+        report_load_mode(loader, load_seconds, rebuild_seconds)
         print("Database seeding completed successfully!")
 
     except Exception as e:
         print(f"Error seeding database: {e}")
-    finally:
-        if conn:
-            conn.close()
+        raise SystemExit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,405 @@
+import psycopg2
+from psycopg2.extras import execute_values
+from datetime import datetime
+import math
+import random
+import threading
+import time
+import os
+
+from seed import (
+    DB_CONFIG,
+    chunk_np_rng,
+    chunk_seed,
+    generate_advertisement_rows,
+    generate_complaint_rows,
+    generate_message_rows,
+    generate_safe_deal_rows,
+    skewed_keys,
+)
+
+TRAFFIC_SESSIONS = int(os.getenv('TRAFFIC_SESSIONS', 8))
+# Target transactions per second over all sessions; 0 runs them flat out.
+TRAFFIC_RATE = float(os.getenv('TRAFFIC_RATE', 100))
+# Seconds to run; 0 runs until interrupted.
+TRAFFIC_DURATION = float(os.getenv('TRAFFIC_DURATION', 0))
+TRAFFIC_REPORT_INTERVAL = float(os.getenv('TRAFFIC_REPORT_INTERVAL', 10))
+# A session whose connection broke, or whose operation failed outside the
+# database, waits before retrying: 0.1s, doubling up to this many seconds.
+TRAFFIC_MAX_RETRY_DELAY = float(os.getenv('TRAFFIC_MAX_RETRY_DELAY', 5))
+TRAFFIC_MIX = os.getenv(
+    'TRAFFIC_MIX',
+    'view=50,message_burst=20,new_ad=10,open_deal=5,close_deal=5,file_complaint=5,resolve_complaint=5'
+)
+
+# Key ranges of the tables the operations pick rows from; new rows extend them.
+KEY_RANGES = {}
+KEY_LOCK = threading.Lock()
+
+KEY_COLUMNS = {
+    'users': 'user_id',
+    'ad_categories': 'category_id',
+    'ad_statuses': 'status_id',
+    'ad_types': 'type_id',
+    'locations': 'location_id',
+    'advertisements': 'ad_id',
+    'conversations': 'conversation_id',
+    'complaint_types': 'type_id',
+    'safe_deals': 'deal_id',
+    'complaints': 'complaint_id',
+}
+# Tables the operations only update may start out empty.
+OPTIONAL_KEYS = ('safe_deals', 'complaints')
+
+# Latency histograms: log-spaced buckets 1% apart, so memory stays constant
+# however long the simulator runs.
+BUCKET_BASE = math.log(1.01)
+
+STATS_LOCK = threading.Lock()
+
+
+def load_key_ranges(conn):
+    with conn.cursor() as cursor:
+        for table, key in KEY_COLUMNS.items():
+            cursor.execute(f"SELECT COALESCE(MIN({key}), 1), COALESCE(MAX({key}), 0) FROM {table}")
+            low, high = cursor.fetchone()
+            if high < low and table not in OPTIONAL_KEYS:
+                raise ValueError(f"{table} is empty; seed the database before simulating traffic")
+            KEY_RANGES[table] = range(low, high + 1)
+    conn.commit()
+
+
+def extend_keys(table, key):
+    with KEY_LOCK:
+        keys = KEY_RANGES[table]
+        if key >= keys.stop:
+            KEY_RANGES[table] = range(keys.start, key + 1)
+
+
+def pick_key(table, task):
+    return int(skewed_keys(chunk_np_rng(f'traffic:{table}', task), KEY_RANGES[table], 1)[0])
+
+
+def new_ad(cursor, task):
+    row = generate_advertisement_rows((task, 0, 1), {
+        'user_ids': KEY_RANGES['users'],
+        'category_ids': KEY_RANGES['ad_categories'],
+        'location_ids': KEY_RANGES['locations'],
+        'status_ids': KEY_RANGES['ad_statuses'],
+        'type_ids': KEY_RANGES['ad_types'],
+    })[0]
+    cursor.execute("""
+        INSERT INTO advertisements (user_id, category_id, location_id, status_id, type_id,
+                                    title, description, price, creation_date, views_count)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 0)
+        RETURNING ad_id
+    """, (*row[1:9], datetime.now()))
+    extend_keys('advertisements', cursor.fetchone()[0])
+
+
+def message_burst(cursor, task):
+    # One generator chunk for a single conversation: 1-10 alternating messages.
+    conversation_id = pick_key('conversations', task)
+    messages = generate_message_rows((task, [conversation_id]), {'user_ids': KEY_RANGES['users']})
+    now = datetime.now()
+    execute_values(cursor, """
+        INSERT INTO messages (sender_id, recipient_id, conversation_id, content, send_date, is_read)
+        VALUES %s
+    """, [(*message[:4], now, False) for message in messages])
+    cursor.execute("""
+        UPDATE conversations SET last_message_date = %s WHERE conversation_id = %s
+    """, (now, conversation_id))
+
+
+def view(cursor, task):
+    cursor.execute("""
+        UPDATE advertisements SET views_count = views_count + 1 WHERE ad_id = %s
+    """, (pick_key('advertisements', task),))
+
+
+def open_deal(cursor, task):
+    ad_id = pick_key('advertisements', task)
+    cursor.execute("SELECT user_id, price FROM advertisements WHERE ad_id = %s", (ad_id,))
+    ad = cursor.fetchone()
+    if ad is None:
+        return False
+    deals = generate_safe_deal_rows((task, [(ad_id, *ad)]), {'user_ids': KEY_RANGES['users']})
+    for buyer_id, seller_id, _, amount, *_ in deals:
+        cursor.execute("""
+            INSERT INTO safe_deals (buyer_id, seller_id, ad_id, amount, status, creation_date)
+            VALUES (%s, %s, %s, %s, 'Pending', %s)
+            RETURNING deal_id
+        """, (buyer_id, seller_id, ad_id, amount, datetime.now()))
+        extend_keys('safe_deals', cursor.fetchone()[0])
+
+
+def close_deal(cursor, task):
+    # The first pending deal at or after a random id, skipping deals another
+    # session is closing right now.
+    rng = random.Random(chunk_seed('traffic:close_deal', task))
+    status = rng.choice(['Completed', 'Cancelled'])
+    cursor.execute("""
+        UPDATE safe_deals
+        SET status = %(status)s,
+            completion_date = CASE WHEN %(status)s = 'Completed' THEN now() END
+        WHERE deal_id = (
+            SELECT deal_id FROM safe_deals
+            WHERE status = 'Pending' AND deal_id >= %(deal_id)s
+            ORDER BY deal_id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+    """, {'status': status, 'deal_id': rng.randrange(KEY_RANGES['safe_deals'].stop)})
+    return cursor.rowcount > 0
+
+
+def file_complaint(cursor, task):
+    complaint = generate_complaint_rows((task, 0, 1), {
+        'type_ids': KEY_RANGES['complaint_types'],
+        'user_ids': KEY_RANGES['users'],
+        'ad_ids': KEY_RANGES['advertisements'],
+    })[0]
+    cursor.execute("""
+        INSERT INTO complaints (reporter_id, ad_id, complaint_type_id, description, status, creation_date)
+        VALUES (%s, %s, %s, %s, 'Pending', %s)
+        RETURNING complaint_id
+    """, (*complaint[:4], datetime.now()))
+    extend_keys('complaints', cursor.fetchone()[0])
+
+
+def resolve_complaint(cursor, task):
+    rng = random.Random(chunk_seed('traffic:resolve_complaint', task))
+    status = rng.choice(['Resolved', 'Rejected'])
+    cursor.execute("""
+        UPDATE complaints
+        SET status = %(status)s,
+            resolution_date = CASE WHEN %(status)s = 'Resolved' THEN now() END
+        WHERE complaint_id = (
+            SELECT complaint_id FROM complaints
+            WHERE status = 'Pending' AND complaint_id >= %(complaint_id)s
+            ORDER BY complaint_id
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+    """, {'status': status, 'complaint_id': rng.randrange(KEY_RANGES['complaints'].stop)})
+    return cursor.rowcount > 0
+
+
+# An operation returns False when it found nothing to change; such runs are
+# counted as no-ops, not transactions.
+OPERATIONS = {
+    'new_ad': new_ad,
+    'message_burst': message_burst,
+    'view': view,
+    'open_deal': open_deal,
+    'close_deal': close_deal,
+    'file_complaint': file_complaint,
+    'resolve_complaint': resolve_complaint,
+}
+
+
+def parse_mix(mix):
+    weights = {}
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"TRAFFIC_MIX: unknown operation {name!r}, expected one of {tuple(OPERATIONS)}")
+        weights[name] = float(weight)
+    return weights
+
+
+def new_stats():
+    return {'count': 0, 'errors': 0, 'noops': 0, 'latency': {}, 'commit': {}}
+
+
+def record_latency(histogram, seconds):
+    bucket = int(math.log(max(seconds, 1e-6) * 1e6) / BUCKET_BASE)
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+
+
+def merge_histogram(target, histogram):
+    for bucket, count in histogram.items():
+        target[bucket] = target.get(bucket, 0) + count
+
+
+def percentile_ms(histogram, q):
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    rank = math.ceil(total * q)
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return math.exp((bucket + 1) * BUCKET_BASE) / 1000
+    return 0.0
+
+
+def record_transaction(stats, operation, latency, commit_latency, wrote):
+    with STATS_LOCK:
+        for scope in stats:
+            op_stats = scope.setdefault(operation, new_stats())
+            if not wrote:
+                op_stats['noops'] += 1
+                continue
+            op_stats['count'] += 1
+            record_latency(op_stats['latency'], latency)
+            record_latency(op_stats['commit'], commit_latency)
+
+
+def record_error(stats, operation, error):
+    with STATS_LOCK:
+        for scope in stats:
+            scope.setdefault(operation, new_stats())['errors'] += 1
+        message = (str(error).strip().splitlines() or [''])[0]
+        if not isinstance(error, psycopg2.Error):
+            message = f"{type(error).__name__}: {message}"
+        stats[0]['last_error'] = f"{operation}: {message}"
+
+
+def run_session(session, weights, stats, stop):
+    rng = random.Random(chunk_seed('traffic', session))
+    names = list(weights)
+    interval = TRAFFIC_SESSIONS / TRAFFIC_RATE if TRAFFIC_RATE > 0 else 0
+    conn = None
+    next_start = time.perf_counter()
+    task_no = 0
+    retry_delay = 0
+
+    while not stop.is_set():
+        # Open-loop pacing: a slow transaction does not push back the schedule,
+        # the session catches up instead of silently lowering the rate.
+        if interval:
+            delay = next_start - time.perf_counter()
+            if delay > 0:
+                stop.wait(delay)
+            next_start += interval
+
+        operation = rng.choices(names, weights=[weights[name] for name in names])[0]
+        task = f'{session}:{task_no}'
+        task_no += 1
+        try:
+            if conn is None or conn.closed:
+                conn = psycopg2.connect(**DB_CONFIG)
+            start_time = time.perf_counter()
+            with conn.cursor() as cursor:
+                wrote = OPERATIONS[operation](cursor, task) is not False
+            commit_start = time.perf_counter()
+            conn.commit()
+            end_time = time.perf_counter()
+            record_transaction(stats, operation, end_time - start_time, end_time - commit_start, wrote)
+            retry_delay = 0
+        except Exception as e:
+            # A failover drops the connection; reconnect on the next transaction.
+            # Anything else is logged too, so a failing session is never lost
+            # silently.
+            record_error(stats, operation, e)
+            if not isinstance(e, psycopg2.Error):
+                print(f"Session {session}: {operation} failed: {type(e).__name__}: {e}")
+            if conn is not None and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    conn.close()
+            if conn is None or conn.closed or not isinstance(e, psycopg2.Error):
+                retry_delay = min(retry_delay * 2 or 0.1, TRAFFIC_MAX_RETRY_DELAY)
+                stop.wait(retry_delay)
+                # The transactions missed while waiting are dropped, not
+                # replayed in a burst.
+                next_start = max(next_start, time.perf_counter())
+
+    if conn is not None and not conn.closed:
+        conn.close()
+
+
+def print_interval(interval_stats, elapsed, seconds):
+    count = sum(s['count'] for name, s in interval_stats.items() if name in OPERATIONS)
+    errors = sum(s['errors'] for name, s in interval_stats.items() if name in OPERATIONS)
+    noops = sum(s['noops'] for name, s in interval_stats.items() if name in OPERATIONS)
+    commits = {}
+    for name, op_stats in interval_stats.items():
+        if name in OPERATIONS:
+            merge_histogram(commits, op_stats['commit'])
+    tps = count / seconds if seconds > 0 else 0
+    print(f"[{elapsed:>7.0f}s] {tps:>8.1f} tps  errors {errors:>5}  no-ops {noops:>5}  commit ms "
+          f"p50 {percentile_ms(commits, 0.5):.2f}  p95 {percentile_ms(commits, 0.95):.2f}  "
+          f"p99 {percentile_ms(commits, 0.99):.2f}  max {percentile_ms(commits, 1.0):.2f}")
+    if 'last_error' in interval_stats:
+        print(f"           last error: {interval_stats['last_error']}")
+
+
+def print_summary(total_stats, seconds):
+    print(f"Traffic summary over {seconds:.1f}s ({TRAFFIC_SESSIONS} sessions, target {TRAFFIC_RATE:g} tps):")
+    print(f"  {'operation':<18} {'txns':>9} {'errors':>7} {'no-ops':>7} {'tps':>9} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}  commit p50/p99 ms")
+    total = 0
+    commits = {}
+    for name in OPERATIONS:
+        op_stats = total_stats.get(name)
+        if op_stats is None:
+            continue
+        total += op_stats['count']
+        merge_histogram(commits, op_stats['commit'])
+        latency = op_stats['latency']
+        print(f"  {name:<18} {op_stats['count']:>9} {op_stats['errors']:>7} {op_stats['noops']:>7} "
+              f"{op_stats['count'] / seconds:>9.1f} "
+              f"{percentile_ms(latency, 0.5):>8.2f} {percentile_ms(latency, 0.95):>8.2f} "
+              f"{percentile_ms(latency, 0.99):>8.2f} {percentile_ms(latency, 1.0):>8.2f}  "
+              f"{percentile_ms(op_stats['commit'], 0.5):.2f}/{percentile_ms(op_stats['commit'], 0.99):.2f}")
+    print(f"  achieved {total / seconds:.1f} tps; commit latency p50 {percentile_ms(commits, 0.5):.2f} ms, "
+          f"p95 {percentile_ms(commits, 0.95):.2f} ms, p99 {percentile_ms(commits, 0.99):.2f} ms, "
+          f"max {percentile_ms(commits, 1.0):.2f} ms")
+
+
+def simulate_traffic():
+    weights = parse_mix(TRAFFIC_MIX)
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        load_key_ranges(conn)
+    finally:
+        conn.close()
+
+    print(f"Simulating traffic: {TRAFFIC_SESSIONS} sessions, target {TRAFFIC_RATE:g} tps, mix {TRAFFIC_MIX}")
+    total_stats = {}
+    interval_stats = {}
+    # Sessions record into both scopes; the interval scope is swapped out by
+    # the reporter, so the list is shared and updated in place.
+    stats = [interval_stats, total_stats]
+    stop = threading.Event()
+    sessions = [
+        threading.Thread(target=run_session, args=(session, weights, stats, stop), daemon=True)
+        for session in range(TRAFFIC_SESSIONS)
+    ]
+
+    start_time = time.perf_counter()
+    last_report = start_time
+    for session in sessions:
+        session.start()
+    try:
+        while True:
+            now = time.perf_counter()
+            if TRAFFIC_DURATION and now - start_time >= TRAFFIC_DURATION:
+                break
+            wait_for = min(last_report + TRAFFIC_REPORT_INTERVAL, start_time + TRAFFIC_DURATION
+                           if TRAFFIC_DURATION else math.inf) - now
+            time.sleep(max(wait_for, 0))
+            now = time.perf_counter()
+            if now - last_report >= TRAFFIC_REPORT_INTERVAL:
+                with STATS_LOCK:
+                    interval_stats = stats[0]
+                    stats[0] = {}
+                print_interval(interval_stats, now - start_time, now - last_report)
+                last_report = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for session in sessions:
+            session.join()
+
+    print_summary(total_stats, time.perf_counter() - start_time)
+
+
+if __name__ == '__main__':
+    simulate_traffic()
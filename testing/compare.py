@@ -0,0 +1,136 @@
+import os
+import sys
+import glob
+import json
+import random
+import statistics
+
+# Compares two results files written by test.py: python compare.py OLD NEW,
+# or the two most recent files in TEST_RESULTS_DIR without arguments.
+TEST_RESULTS_DIR = os.getenv("TEST_RESULTS_DIR", "results")
+# The median latency ratio NEW/OLD gets a bootstrap confidence interval; a
+# change is significant when the interval does not contain 1.
+COMPARE_CONFIDENCE = float(os.getenv("COMPARE_CONFIDENCE", 0.95))
+COMPARE_RESAMPLES = int(os.getenv("COMPARE_RESAMPLES", 2000))
+# Longer runs (load mode) are subsampled to keep resampling fast.
+COMPARE_MAX_SAMPLES = int(os.getenv("COMPARE_MAX_SAMPLES", 1000))
+# Fewer samples than this per query are reported but not judged.
+COMPARE_MIN_SAMPLES = int(os.getenv("COMPARE_MIN_SAMPLES", 5))
+# Tables and indexes whose size changed by at least this share are listed.
+COMPARE_SIZE_CHANGE = float(os.getenv("COMPARE_SIZE_CHANGE", 0.1))
+COMPARE_MAX_SIZES = int(os.getenv("COMPARE_MAX_SIZES", 20))
+
+
+def load_run(path):
+    with open(path, encoding='utf-8') as results_file:
+        return json.load(results_file)
+
+
+def latest_runs():
+    paths = sorted(glob.glob(os.path.join(TEST_RESULTS_DIR, "*.json")))
+    if len(paths) < 2:
+        raise SystemExit(f"В {TEST_RESULTS_DIR} меньше двух файлов результатов")
+    return paths[-2], paths[-1]
+
+
+def ratio_interval(old, new, rng):
+    if len(old) > COMPARE_MAX_SAMPLES:
+        old = rng.sample(old, COMPARE_MAX_SAMPLES)
+    if len(new) > COMPARE_MAX_SAMPLES:
+        new = rng.sample(new, COMPARE_MAX_SAMPLES)
+    ratios = sorted(
+        statistics.median(rng.choices(new, k=len(new))) / max(statistics.median(rng.choices(old, k=len(old))), 1e-3)
+        for _ in range(COMPARE_RESAMPLES)
+    )
+    tail = (1 - COMPARE_CONFIDENCE) / 2
+    return ratios[int(tail * len(ratios))], ratios[min(int((1 - tail) * len(ratios)), len(ratios) - 1)]
+
+
+def print_run_differences(old, new):
+    for field in ('git_sha', 'mode', 'migration_version', 'seed_dataset', 'server_version'):
+        marker = "" if old.get(field) == new.get(field) else "  <- изменено"
+        print(f"{field:<18} {old.get(field)} -> {new.get(field)}{marker}")
+    for field in sorted(set(old['config']) | set(new['config'])):
+        if old['config'].get(field) != new['config'].get(field):
+            print(f"{field:<18} {old['config'].get(field)} -> {new['config'].get(field)}  <- изменено")
+    old_settings, new_settings = old['settings'], new['settings']
+    for name in sorted(set(old_settings) | set(new_settings)):
+        if old_settings.get(name) != new_settings.get(name):
+            print(f"настройка {name}: {old_settings.get(name, '(по умолчанию)')} -> "
+                  f"{new_settings.get(name, '(по умолчанию)')}")
+
+
+def print_size_differences(old, new):
+    # Results written before sizes were recorded have none to compare.
+    old_sizes, new_sizes = old.get('relation_sizes'), new.get('relation_sizes')
+    if not old_sizes or not new_sizes:
+        return
+    changed = []
+    for name in set(old_sizes) | set(new_sizes):
+        old_size, new_size = old_sizes.get(name), new_sizes.get(name)
+        if old_size is None or new_size is None \
+                or abs(new_size - old_size) >= COMPARE_SIZE_CHANGE * max(old_size, 1):
+            changed.append((name, old_size, new_size))
+    if not changed:
+        return
+    print(f"\nРазмеры таблиц и индексов, изменившиеся не меньше чем на {COMPARE_SIZE_CHANGE:.0%}, КБ:")
+    changed.sort(key=lambda item: -(item[2] or 0))
+    for name, old_size, new_size in changed[:COMPARE_MAX_SIZES]:
+        old_text = "нет" if old_size is None else f"{old_size / 1024:.0f}"
+        new_text = "нет" if new_size is None else f"{new_size / 1024:.0f}"
+        print(f"{name:<40} {old_text:>10} -> {new_text:>10}")
+    if len(changed) > COMPARE_MAX_SIZES:
+        print(f"... и ещё {len(changed) - COMPARE_MAX_SIZES}")
+
+
+def compare(old_path, new_path):
+    old, new = load_run(old_path), load_run(new_path)
+    print(f"Было:  {old_path} ({old['started_at']})")
+    print(f"Стало: {new_path} ({new['started_at']})")
+    print_run_differences(old, new)
+    print_size_differences(old, new)
+
+    print(f"\nМедианы задержек в мс, {COMPARE_CONFIDENCE:.0%} доверительный интервал изменения:")
+    print(f"{'запрос':<28} {'n было':>7} {'n стало':>7} {'было':>9} {'стало':>9} "
+          f"{'изменение':>10} {'интервал':>18}  итог")
+    rng = random.Random(0)
+    faster = slower = 0
+    for name, new_query in new['queries'].items():
+        old_query = old['queries'].get(name)
+        if not old_query:
+            print(f"{name:<28} нет в прежнем прогоне")
+            continue
+        old_samples, new_samples = old_query['samples_ms'], new_query['samples_ms']
+        if min(len(old_samples), len(new_samples)) < COMPARE_MIN_SAMPLES:
+            print(f"{name:<28} {len(old_samples):>7} {len(new_samples):>7} мало замеров")
+            continue
+        old_median, new_median = statistics.median(old_samples), statistics.median(new_samples)
+        low, high = ratio_interval(old_samples, new_samples, rng)
+        if low > 1:
+            verdict = "МЕДЛЕННЕЕ"
+            slower += 1
+        elif high < 1:
+            verdict = "быстрее"
+            faster += 1
+        else:
+            verdict = "не значимо"
+        print(f"{name:<28} {len(old_samples):>7} {len(new_samples):>7} {old_median:>9.3f} {new_median:>9.3f} "
+              f"{new_median / max(old_median, 1e-3) - 1:>+10.1%} "
+              f"{f'{low - 1:+.1%}..{high - 1:+.1%}':>18}  {verdict}")
+    print(f"\nЗначимо быстрее: {faster}, значимо медленнее: {slower}")
+    return slower
+
+
+def main():
+    if len(sys.argv) == 3:
+        old_path, new_path = sys.argv[1:]
+    elif len(sys.argv) == 1:
+        old_path, new_path = latest_runs()
+    else:
+        raise SystemExit("Использование: python compare.py [OLD.json NEW.json]")
+    # A non-zero exit status lets CI fail on slowdowns.
+    sys.exit(1 if compare(old_path, new_path) else 0)
+
+
+if __name__ == "__main__":
+    main()
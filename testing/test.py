@@ -1,8 +1,20 @@
 import os
+import json
+import math
+from datetime import datetime, timedelta
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+import threading
 import time
 from faker import Faker
 import random
+import re
+import resource
+import subprocess
+import tracemalloc
+import weakref
+import yaml
 
 DB_CONFIG = {
     "host": os.getenv("POSTGRES_HOST", "haproxy"),
@@ -12,256 +24,1052 @@ DB_CONFIG = {
     "password": os.getenv("POSTGRES_PASSWORD"),
 }
 
+# pool: persistent connections reused by every query;
+# fresh: a new connection per query, to measure connection overhead.
+TEST_CONNECTION_MODE = os.getenv("TEST_CONNECTION_MODE", "pool")
+TEST_POOL_SIZE = int(os.getenv("TEST_POOL_SIZE", 4))
+# once: every query once, sequentially; load: TEST_CLIENTS concurrent clients
+# running the weighted mix for TEST_DURATION seconds or TEST_ITERATIONS executions.
+# Warmup executions are not measured: the first TEST_WARMUP seconds, or with
+# TEST_ITERATIONS the first TEST_WARMUP_ITERATIONS executions of every client.
+TEST_MODE = os.getenv("TEST_MODE", "once")
+TEST_CLIENTS = int(os.getenv("TEST_CLIENTS", 8))
+TEST_DURATION = float(os.getenv("TEST_DURATION", 60))
+TEST_ITERATIONS = int(os.getenv("TEST_ITERATIONS", 0))
+TEST_WARMUP = float(os.getenv("TEST_WARMUP", 10))
+TEST_WARMUP_ITERATIONS = int(os.getenv("TEST_WARMUP_ITERATIONS", TEST_ITERATIONS // 10))
+TEST_WORKLOAD = os.getenv("TEST_WORKLOAD", "workload.yaml")
+# Runs the SQL a workload query lists under one of these (comma-separated)
+# names in `variants`, if any; the first name listed by the query wins.
+TEST_VARIANT = os.getenv("TEST_VARIANT", "")
+TEST_VARIANTS = [name.strip() for name in TEST_VARIANT.split(",") if name.strip()]
+# simple: query text parsed and planned on every call; prepared: PREPARE once
+# per connection, then EXECUTE.
+TEST_QUERY_MODE = os.getenv("TEST_QUERY_MODE", "simple")
+# Session plan_cache_mode for prepared statements (auto, force_generic_plan,
+# force_custom_plan); empty keeps the server setting.
+TEST_PLAN_CACHE_MODE = os.getenv("TEST_PLAN_CACHE_MODE", "")
+# Every Nth execution of a query in load mode is repeated under EXPLAIN ANALYZE
+# to split server time into planning and execution; 0 disables it.
+TEST_EXPLAIN_EVERY = int(os.getenv("TEST_EXPLAIN_EVERY", 20))
+# buffered: fetchall() on a client-side cursor; stream: named server-side
+# cursor fetching TEST_ITERSIZE rows per round trip.
+TEST_FETCH_MODE = os.getenv("TEST_FETCH_MODE", "buffered")
+TEST_ITERSIZE = int(os.getenv("TEST_ITERSIZE", 2000))
+# Plans captured in once mode are written to TEST_PLAN_DIR/latest.json and
+# compared with TEST_PLAN_DIR/baseline.json (created by the first run, or
+# replaced when TEST_UPDATE_BASELINE is set).
+TEST_PLAN_DIR = os.getenv("TEST_PLAN_DIR", "plans")
+TEST_UPDATE_BASELINE = os.getenv("TEST_UPDATE_BASELINE", "false").lower() in ("1", "true", "yes")
+# A query regresses when its buffers or server execution time grow by more
+# than this factor over the baseline.
+TEST_REGRESSION_RATIO = float(os.getenv("TEST_REGRESSION_RATIO", 2.0))
+# Every run is saved to TEST_RESULTS_DIR for compare.py. Once mode then runs
+# the workload TEST_REPEAT more times, quietly, to collect latency samples.
+TEST_RESULTS_DIR = os.getenv("TEST_RESULTS_DIR", "results")
+TEST_REPEAT = int(os.getenv("TEST_REPEAT", 10))
+# Load mode keeps a uniform random sample of at most this many latencies per
+# query for the results file; the report itself comes from the histograms.
+TEST_MAX_SAMPLES = int(os.getenv("TEST_MAX_SAMPLES", 1000))
+# Commit of the tree under test; asked from git when empty.
+TEST_GIT_SHA = os.getenv("TEST_GIT_SHA", "")
+# Prometheus metrics are served on this port while the test runs (0 disables);
+# after the run the process stays up TEST_METRICS_LINGER seconds so the final
+# values get scraped before the container restarts.
+TEST_METRICS_PORT = int(os.getenv("TEST_METRICS_PORT", 8000))
+TEST_METRICS_LINGER = float(os.getenv("TEST_METRICS_LINGER", 30))
+# single: every query goes to POSTGRES_HOST:POSTGRES_PORT (HAProxy 5000, round
+# robin over both nodes); split: writes go to the leader on TEST_LEADER_PORT
+# (HAProxy 5001), reads round-robin over the replicas lagging at most
+# TEST_MAX_REPLICA_LAG seconds, and to the leader when none qualifies.
+TEST_ROUTING = os.getenv("TEST_ROUTING", "single")
+TEST_LEADER_PORT = os.getenv("TEST_LEADER_PORT", "5001")
+# Comma-separated host[:port] list; empty takes the replicas streaming from the
+# leader in pg_stat_replication (Patroni names them after their host).
+TEST_REPLICA_HOSTS = os.getenv("TEST_REPLICA_HOSTS", "")
+TEST_REPLICA_PORT = os.getenv("TEST_REPLICA_PORT", "5432")
+TEST_MAX_REPLICA_LAG = float(os.getenv("TEST_MAX_REPLICA_LAG", 5))
+TEST_LAG_CHECK_INTERVAL = float(os.getenv("TEST_LAG_CHECK_INTERVAL", 5))
+
+CONNECTION_MODES = ("pool", "fresh")
+TEST_MODES = ("once", "load")
+QUERY_MODES = ("simple", "prepared")
+FETCH_MODES = ("buffered", "stream")
+ROUTING_MODES = ("single", "split")
+ACCESS_MODES = ("read", "write")
+DISTRIBUTIONS = ("uniform", "zipf", "choice", "date_range")
+
+# Latency histograms keep counts per log-spaced bucket 1% wide (HDR style):
+# constant memory and bounded relative error for any number of samples.
+BUCKET_BASE = math.log(1.01)
+
+METRIC_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                  0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_DURATION = Histogram("avito_test_query_duration_seconds",
+                           "Client-observed query time, including fetching the result",
+                           ["query"], buckets=METRIC_BUCKETS)
+QUERY_ERRORS = Counter("avito_test_query_errors", "Failed query executions", ["query"])
+QUERY_ROWS = Gauge("avito_test_query_rows", "Rows returned by the latest execution", ["query"])
+CONNECT_DURATION = Histogram("avito_test_connect_duration_seconds",
+                             "Time to get a connection: pool checkout or a full connect",
+                             ["mode"], buckets=METRIC_BUCKETS)
+ROUTED_QUERIES = Counter("avito_test_routed_queries", "Query executions per node", ["target", "access"])
+REPLICA_LAG = Gauge("avito_test_replica_lag_seconds", "Replay lag of each replica at the last check", ["replica"])
+
 fake = Faker()
 
+pool = None
+
+# Split routing: {'name', 'config', 'pool', 'lag', 'eligible'} per replica.
+replicas = []
+replica_turn = 0
+replicas_checked_at = 0.0
+replica_check_lock = threading.Lock()
+
+workload = []
+key_ranges = {}
+
+# connection -> names of the statements prepared on it.
+prepared_statements = weakref.WeakKeyDictionary()
+# connection -> (target node, pool it came from or None).
+connection_routes = weakref.WeakKeyDictionary()
+
+PLACEHOLDER = re.compile(r"%\((\w+)\)s")
+# Data-modifying statements, row locks and sequence calls need the leader.
+WRITE_KEYWORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|TRUNCATE|CREATE|ALTER|DROP|SHARE|nextval|setval)\b",
+                            re.IGNORECASE)
+
+
+def leader_config():
+    return {**DB_CONFIG, "port": TEST_LEADER_PORT} if TEST_ROUTING == "split" else DB_CONFIG
+
+
+def leader_target():
+    return "leader" if TEST_ROUTING == "split" else "default"
+
+
+def open_pool(size=TEST_POOL_SIZE):
+    global pool
+    start_time = time.perf_counter()
+    pool = ThreadedConnectionPool(size, size, **leader_config(), client_encoding='utf-8')
+    for replica in replicas:
+        try:
+            replica['pool'] = ThreadedConnectionPool(size, size, **replica['config'], client_encoding='utf-8')
+        except psycopg2.OperationalError as e:
+            print(f"Реплика {replica['name']} недоступна: {e}")
+    return time.perf_counter() - start_time
+
+
+def close_pool():
+    global pool
+    if pool:
+        pool.closeall()
+        pool = None
+    for replica in replicas:
+        if replica['pool']:
+            replica['pool'].closeall()
+            replica['pool'] = None
+
+
+def discover_replicas():
+    if TEST_REPLICA_HOSTS:
+        hosts = [entry.strip() for entry in TEST_REPLICA_HOSTS.split(',') if entry.strip()]
+    else:
+        conn = psycopg2.connect(**leader_config(), client_encoding='utf-8')
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT application_name FROM pg_stat_replication ORDER BY application_name")
+                hosts = [name for name, in cursor.fetchall()]
+        finally:
+            conn.close()
+    for entry in hosts:
+        host, _, port = entry.rpartition(':') if ':' in entry else (entry, '', TEST_REPLICA_PORT)
+        replicas.append({
+            'name': host,
+            'config': {**DB_CONFIG, "host": host, "port": port},
+            'pool': None,
+            'lag': None,
+            'eligible': False,
+        })
+    print(f"Реплики для чтения: {', '.join(replica['name'] for replica in replicas) or 'нет'}")
+    check_replicas()
+
+
+def check_replicas():
+    # A replica that has replayed the leader's current WAL position is not
+    # behind (an idle leader sends nothing); otherwise its lag is the time
+    # since the last replayed transaction, or the leader's replay_lag if
+    # larger. Replicas the leader's pg_stat_replication does not list as
+    # streaming receive nothing and are dropped.
+    global replicas_checked_at
+    streaming = {}
+    conn = psycopg2.connect(**leader_config(), client_encoding='utf-8')
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_current_wal_lsn()")
+            leader_lsn = cursor.fetchone()[0]
+            # Discovered replicas are named after application_name; those from
+            # TEST_REPLICA_HOSTS may be given by address or host name instead.
+            cursor.execute("""
+                SELECT application_name, host(client_addr), client_hostname, state, EXTRACT(EPOCH FROM replay_lag)
+                FROM pg_stat_replication
+            """)
+            for name, address, hostname, state, replay_lag in cursor.fetchall():
+                for key in (name, address, hostname):
+                    if key:
+                        streaming[key] = (state, float(replay_lag or 0))
+    finally:
+        conn.close()
+
+    for replica in replicas:
+        try:
+            conn = psycopg2.connect(**replica['config'], client_encoding='utf-8', connect_timeout=5)
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT pg_is_in_recovery(),
+                               CASE WHEN pg_last_wal_replay_lsn() >= %s::pg_lsn THEN 0
+                                    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                               END
+                    """, (leader_lsn,))
+                    in_recovery, lag = cursor.fetchone()
+            finally:
+                conn.close()
+        except psycopg2.Error:
+            in_recovery, lag = False, None
+        state, replay_lag = streaming.get(replica['name'], (None, 0.0))
+        lag = max(float(lag), replay_lag) if lag is not None else None
+        eligible = bool(in_recovery) and state == "streaming" and lag is not None and lag <= TEST_MAX_REPLICA_LAG
+        if eligible != replica['eligible']:
+            reason = "" if lag is None else f", отставание {lag:.1f} сек"
+            print(f"Реплика {replica['name']} {'используется' if eligible else 'исключена'}{reason}")
+        replica['lag'] = lag
+        replica['eligible'] = eligible
+        if lag is not None:
+            REPLICA_LAG.labels(replica['name']).set(lag)
+    replicas_checked_at = time.perf_counter()
+
+
+def next_replica():
+    # Round robin over the replicas within the lag bound; lag is rechecked
+    # every TEST_LAG_CHECK_INTERVAL seconds by whichever client gets there first.
+    global replica_turn
+    if time.perf_counter() - replicas_checked_at >= TEST_LAG_CHECK_INTERVAL \
+            and replica_check_lock.acquire(blocking=False):
+        try:
+            check_replicas()
+        except psycopg2.Error as e:
+            print(f"Не удалось проверить отставание реплик: {e}")
+        finally:
+            replica_check_lock.release()
+    # In pool mode only replicas whose pool could be opened.
+    eligible = [replica for replica in replicas if replica['eligible'] and (replica['pool'] or not pool)]
+    if not eligible:
+        return None
+    replica_turn += 1
+    return eligible[replica_turn % len(eligible)]
+
+
+def route(query):
+    # (target node, pool, connection settings) for a query; without a query
+    # (key ranges, settings) the leader.
+    if query and query['access'] == "read" and TEST_ROUTING == "split":
+        replica = next_replica()
+        if replica:
+            return replica['name'], replica['pool'], replica['config']
+    return leader_target(), pool, leader_config()
+
+
+def acquire_connection(query=None):
+    # Returns the connection and the time it took: a full TCP + auth
+    # handshake in fresh mode, a pool checkout otherwise.
+    target, target_pool, config = route(query)
+    start_time = time.perf_counter()
+    if target_pool:
+        conn = target_pool.getconn()
+    else:
+        conn = psycopg2.connect(**config, client_encoding='utf-8')
+    connect_time = time.perf_counter() - start_time
+    connection_routes[conn] = (target, target_pool)
+    CONNECT_DURATION.labels(TEST_CONNECTION_MODE).observe(connect_time)
+    if query:
+        ROUTED_QUERIES.labels(target, query['access']).inc()
+    return conn, connect_time
+
+
+def connection_target(conn):
+    return connection_routes[conn][0]
+
 
-def execute_query(query, params=None):
+def release_connection(conn):
+    _, target_pool = connection_routes.get(conn, (None, None))
+    if not target_pool:
+        conn.close()
+        return
+    if not conn.closed:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            pass
+    target_pool.putconn(conn, close=bool(conn.closed))
+
+
+def observe_query(query, execution_time, row_count):
+    QUERY_DURATION.labels(query['name']).observe(execution_time)
+    QUERY_ROWS.labels(query['name']).set(row_count)
+
+
+def execute_query(query, params):
     conn = None
+    connect_time = 0
     try:
-        conn = psycopg2.connect(
-            **DB_CONFIG,
-            client_encoding='utf-8'
-        )
-        cursor = conn.cursor()
-        start_time = time.time()
-        cursor.execute(query, params or ())
-        result = cursor.fetchall()
-        execution_time = time.time() - start_time
-        print(f"Запрос выполнен за {execution_time:.4f} сек")
-        return result, execution_time
+        conn, connect_time = acquire_connection(query)
+        prepare_time = prepare_query(conn, query)
+        start_time = time.perf_counter()
+        head, row_count, _, first_row_time = fetch_query(conn, query, params)
+        execution_time = time.perf_counter() - start_time
+        observe_query(query, execution_time, row_count)
+        via = f" ({connection_target(conn)}, {query['access']})" if TEST_ROUTING == "split" else ""
+        print(f"Соединение{via} получено за {connect_time:.4f} сек, запрос выполнен за {execution_time:.4f} сек")
+        print(f"Первая строка через {first_row_time:.4f} сек, строк: {row_count} ({TEST_FETCH_MODE})")
+        # Result size and client memory come from a second, untimed pass:
+        # tracing allocations and encoding every value would otherwise be
+        # counted as query time. Writes are not repeated.
+        if query['access'] == "read":
+            tracemalloc.start()
+            _, _, size, _ = fetch_query(conn, query, params, count_bytes=True)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"Результат: ~{size} байт, пик памяти клиента: {peak_memory / 1024:.1f} КБ")
+        with conn.cursor() as cursor:
+            plan = explain_query(cursor, query, params)
+        if TEST_QUERY_MODE == "prepared":
+            print(f"Подготовка: {prepare_time * 1000:.2f} мс")
+        print(f"На сервере: планирование {plan['Planning Time']:.2f} мс, "
+              f"выполнение {plan['Execution Time']:.2f} мс")
+        return head, row_count, execution_time, connect_time, plan
     except Exception as e:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        QUERY_ERRORS.labels(query['name']).inc()
         print(f"Ошибка при выполнении запроса: {e}")
-        return None, 0
+        return None, 0, 0, connect_time, None
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+
+
+def fetch_query(conn, query, params, count_bytes=False):
+    # Consumes the result and returns its first rows, row count, approximate
+    # size (text form of the values, as sent by the server) and time to first
+    # row. A named cursor only holds TEST_ITERSIZE rows at a time; buffered
+    # mode has the whole result client-side before the first row is seen.
+    start_time = time.perf_counter()
+    if TEST_FETCH_MODE == "stream" and query['access'] == "read":
+        cursor = conn.cursor(name=f"{query['statement']}_cursor")
+        cursor.itersize = TEST_ITERSIZE
+        cursor.execute(query['sql'], params)
+        rows = cursor
+    else:
+        cursor = conn.cursor()
+        rows = run_query(cursor, query, params)
+
+    head = []
+    row_count = 0
+    size = 0
+    first_row_time = None
+    try:
+        for row in rows:
+            if first_row_time is None:
+                first_row_time = time.perf_counter() - start_time
+            if len(head) < 3:
+                head.append(row)
+            row_count += 1
+            if count_bytes:
+                size += sum(len(str(value).encode()) for value in row if value is not None)
+    finally:
+        cursor.close()
+    if first_row_time is None:
+        first_row_time = time.perf_counter() - start_time
+    if query['access'] == "write":
+        conn.commit()
+    return head, row_count, size, first_row_time
+
+
+def time_query(query, params):
+    # Execution time, row count and serving node only, for the repeated passes.
+    conn, _ = acquire_connection(query)
+    try:
+        prepare_query(conn, query)
+        start_time = time.perf_counter()
+        _, row_count, _, _ = fetch_query(conn, query, params)
+        execution_time = time.perf_counter() - start_time
+        observe_query(query, execution_time, row_count)
+        return execution_time, row_count, connection_target(conn)
+    finally:
+        release_connection(conn)
+
+
+def prepare_query(conn, query):
+    # Returns the time spent on PREPARE, 0 if the statement already exists on
+    # this connection (or in simple mode).
+    if TEST_QUERY_MODE != "prepared":
+        return 0
+    statements = prepared_statements.get(conn)
+    if statements is None:
+        statements = prepared_statements[conn] = set()
+        if TEST_PLAN_CACHE_MODE:
+            with conn.cursor() as cursor:
+                cursor.execute("SET plan_cache_mode = %s", (TEST_PLAN_CACHE_MODE,))
+            conn.commit()
+    if query['statement'] in statements:
+        return 0
+    start_time = time.perf_counter()
+    with conn.cursor() as cursor:
+        cursor.execute(f"PREPARE {query['statement']} AS {query['positional_sql']}")
+    conn.commit()
+    statements.add(query['statement'])
+    return time.perf_counter() - start_time
+
+
+def run_query(cursor, query, params, prefix=""):
+    if TEST_QUERY_MODE == "prepared":
+        cursor.execute(prefix + query['execute_sql'], [params[name] for name in query['param_names']])
+    else:
+        cursor.execute(prefix + query['sql'], params)
+    return cursor.fetchall()
+
+
+def explain_query(cursor, query, params):
+    # The JSON plan with planning and execution time as measured by the
+    # server, in ms. For a prepared statement planning is close to 0 once a
+    # generic plan is cached.
+    return run_query(cursor, query, params, "EXPLAIN (ANALYZE, BUFFERS, SUMMARY, FORMAT JSON) ")[0][0][0]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def plan_shape(node):
+    label = node['Node Type'] + (f" {node['Join Type']}" if 'Join Type' in node else "")
+    children = node.get('Plans', [])
+    return label + (f"({', '.join(map(plan_shape, children))})" if children else "")
+
+
+def summarize_plan(plan):
+    # Buffer counts of the top node include all of its children.
+    root = plan['Plan']
+    nodes = list(plan_nodes(root))
+    return {
+        'shape': plan_shape(root),
+        'join_order': [node.get('Alias', node['Relation Name']) for node in nodes if 'Relation Name' in node],
+        'indexes': sorted({node['Index Name'] for node in nodes if 'Index Name' in node}),
+        'shared_hit': root.get('Shared Hit Blocks', 0),
+        'shared_read': root.get('Shared Read Blocks', 0),
+        'planning_ms': plan['Planning Time'],
+        'execution_ms': plan['Execution Time'],
+    }
+
+
+def grew(baseline, current, minimum):
+    # Ignores growth below `minimum`, where timer noise and a handful of
+    # catalog pages dominate.
+    return current - baseline > minimum and current > baseline * TEST_REGRESSION_RATIO
+
 
+def compare_plans(baseline, current):
+    # Returns (regressions, changes) found between two plan summaries.
+    regressions = []
+    changes = []
+    if current['shape'] != baseline['shape']:
+        changes.append(f"форма плана: {baseline['shape']} -> {current['shape']}")
+    if current['join_order'] != baseline['join_order']:
+        changes.append(f"порядок соединений: {' > '.join(baseline['join_order'])} -> "
+                       f"{' > '.join(current['join_order'])}")
+    dropped = sorted(set(baseline['indexes']) - set(current['indexes']))
+    added = sorted(set(current['indexes']) - set(baseline['indexes']))
+    if dropped:
+        regressions.append(f"индексы больше не используются: {', '.join(dropped)}")
+    if added:
+        changes.append(f"новые индексы: {', '.join(added)}")
+    baseline_buffers = baseline['shared_hit'] + baseline['shared_read']
+    current_buffers = current['shared_hit'] + current['shared_read']
+    if grew(baseline_buffers, current_buffers, 100):
+        regressions.append(f"буферов: {baseline_buffers} -> {current_buffers}")
+    if grew(baseline['shared_read'], current['shared_read'], 100):
+        regressions.append(f"чтений с диска: {baseline['shared_read']} -> {current['shared_read']}")
+    if grew(baseline['execution_ms'], current['execution_ms'], 5.0):
+        regressions.append(f"выполнение: {baseline['execution_ms']:.2f} мс -> {current['execution_ms']:.2f} мс")
+    return regressions, changes
 
-def generate_test_queries():
-    queries = []
-
-    queries.append((
-        "SELECT user_id, username, email FROM users WHERE is_active = TRUE AND is_blocked = FALSE LIMIT 100;",
-        None
-    ))
-
-    queries.append((
-        """SELECT a.ad_id, a.title, u.username, up.rating 
-           FROM advertisements a
-           JOIN users u ON a.user_id = u.user_id
-           JOIN user_profiles up ON u.user_id = up.user_id
-           WHERE a.status_id = 1
-           ORDER BY up.rating DESC
-           LIMIT 50;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT c.name, COUNT(a.ad_id) as ad_count, AVG(a.price) as avg_price
-           FROM advertisements a
-           JOIN ad_categories c ON a.category_id = c.category_id
-           GROUP BY c.name
-           ORDER BY ad_count DESC;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT a.ad_id, a.title, a.price, l.name as location
-           FROM advertisements a
-           JOIN locations l ON a.location_id = l.location_id
-           WHERE a.price BETWEEN %s AND %s
-           AND a.category_id = %s
-           AND a.creation_date > NOW() - INTERVAL '30 days';""",
-        (5000, 20000, random.randint(1, 10))
-    ))
-
-    queries.append((
-        """SELECT m.message_id, u1.username as sender, u2.username as receiver, 
-                  a.title as ad_title, m.send_date
-           FROM messages m
-           JOIN users u1 ON m.sender_id = u1.user_id
-           JOIN users u2 ON m.recipient_id = u2.user_id
-           JOIN conversations c ON m.conversation_id = c.conversation_id
-           JOIN advertisements a ON c.ad_id = a.ad_id
-           WHERE m.send_date > NOW() - INTERVAL '7 days'
-           ORDER BY m.send_date DESC
-           LIMIT 20;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT u.user_id, u.username, up.rating, ad_counts.ad_count
-           FROM users u
-           JOIN user_profiles up ON u.user_id = up.user_id
-           JOIN (
-               SELECT user_id, COUNT(*) as ad_count 
-               FROM advertisements 
-               GROUP BY user_id
-           ) ad_counts ON u.user_id = ad_counts.user_id
-           ORDER BY ad_counts.ad_count DESC
-           LIMIT 10;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT a.ad_id, a.title, re.property_type, re.area, re.rooms
-           FROM advertisements a
-           JOIN real_estate_ads re ON a.ad_id = re.ad_id
-           WHERE EXISTS (
-               SELECT 1 FROM ad_photos p 
-               WHERE p.ad_id = a.ad_id
-           )
-           AND a.price BETWEEN %s AND %s;""",
-        (1000000, 5000000)
-    ))
-
-    queries.append((
-        """SELECT l.name as city, AVG(up.rating) as avg_rating, COUNT(u.user_id) as users
-           FROM users u
-           JOIN user_profiles up ON u.user_id = up.user_id
-           JOIN advertisements a ON u.user_id = a.user_id
-           JOIN locations l ON a.location_id = l.location_id
-           WHERE l.type = 'city'
-           GROUP BY l.name
-           HAVING COUNT(u.user_id) > 5
-           ORDER BY avg_rating DESC;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT u.username, a.title, d.amount, d.status, d.creation_date
-           FROM safe_deals d
-           JOIN users u ON d.buyer_id = u.user_id OR d.seller_id = u.user_id
-           JOIN advertisements a ON d.ad_id = a.ad_id
-           JOIN ad_categories c ON a.category_id = c.category_id
-           JOIN locations l ON a.location_id = l.location_id
-           WHERE u.user_id = %s
-           ORDER BY d.creation_date DESC;""",
-        (random.randint(1, 100),)
-    ))
-
-    queries.append((
-        """SELECT ct.name as complaint_type, u.username, a.title, 
-                  c.status, c.creation_date
-           FROM complaints c
-           JOIN complaint_types ct ON c.complaint_type_id = ct.type_id
-           JOIN users u ON c.reporter_id = u.user_id
-           JOIN advertisements a ON c.ad_id = a.ad_id
-           WHERE c.status = 'pending'
-           AND c.creation_date > (SELECT NOW() - INTERVAL '30 days')
-           ORDER BY c.creation_date DESC;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT 
-               u.user_id,
-               u.username,
-               COUNT(DISTINCT a.ad_id) as ads_count,
-               COUNT(DISTINCT m.message_id) as messages_count,
-               COUNT(DISTINCT r.review_id) as reviews_count
-           FROM users u
-           LEFT JOIN advertisements a ON u.user_id = a.user_id
-           LEFT JOIN messages m ON u.user_id = m.sender_id
-           LEFT JOIN reviews r ON u.user_id = r.reviewer_id
-           GROUP BY u.user_id, u.username
-           ORDER BY ads_count DESC
-           LIMIT 20;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT a.title, j.position, j.employment_type, 
-                  j.salary_from, j.salary_to, l.name as location
-           FROM advertisements a
-           JOIN job_ads j ON a.ad_id = j.ad_id
-           JOIN locations l ON a.location_id = l.location_id
-           WHERE j.salary_to >= %s
-           AND a.status_id = 1
-           ORDER BY j.salary_from DESC;""",
-        (50000,)
-    ))
-
-    queries.append((
-        """WITH RECURSIVE category_tree AS (
-               SELECT category_id, name, parent_id, 1 as level
-               FROM ad_categories
-               WHERE parent_id IS NULL
-               UNION ALL
-               SELECT c.category_id, c.name, c.parent_id, ct.level + 1
-               FROM ad_categories c
-               JOIN category_tree ct ON c.parent_id = ct.category_id
-           )
-           SELECT 
-               ct.name as category,
-               ct.level,
-               COUNT(a.ad_id) as ad_count,
-               AVG(a.price) as avg_price
-           FROM category_tree ct
-           LEFT JOIN advertisements a ON ct.category_id = a.category_id
-           GROUP BY ct.category_id, ct.name, ct.level
-           ORDER BY ct.level, ct.name;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT 
-               a.ad_id,
-               a.title,
-               a.price,
-               c.name as category,
-               AVG(a.price) OVER (PARTITION BY a.category_id) as avg_category_price,
-               a.price - AVG(a.price) OVER (PARTITION BY a.category_id) as price_diff
-           FROM advertisements a
-           JOIN ad_categories c ON a.category_id = c.category_id
-           WHERE a.status_id = 1
-           ORDER BY price_diff DESC
-           LIMIT 20;""",
-        None
-    ))
-
-    queries.append((
-        """SELECT 
-               a.ad_id, a.title, a.description, a.price, a.creation_date,
-               u.username, up.rating,
-               c.name as category,
-               l.name as location,
-               s.name as status,
-               t.name as type,
-               (SELECT COUNT(*) FROM ad_photos p WHERE p.ad_id = a.ad_id) as photos_count,
-               (SELECT COUNT(*) FROM messages m 
-                JOIN conversations cv ON m.conversation_id = cv.conversation_id
-                WHERE cv.ad_id = a.ad_id) as messages_count
-           FROM advertisements a
-           JOIN users u ON a.user_id = u.user_id
-           JOIN user_profiles up ON u.user_id = up.user_id
-           JOIN ad_categories c ON a.category_id = c.category_id
-           JOIN locations l ON a.location_id = l.location_id
-           JOIN ad_statuses s ON a.status_id = s.status_id
-           JOIN ad_types t ON a.type_id = t.type_id
-           WHERE a.ad_id = %s;""",
-        (random.randint(1, 1000),)
-    ))
 
+def save_plans(captured):
+    os.makedirs(TEST_PLAN_DIR, exist_ok=True)
+    run = {'captured_at': datetime.now().isoformat(timespec='seconds'), 'queries': captured}
+    with open(os.path.join(TEST_PLAN_DIR, 'latest.json'), 'w', encoding='utf-8') as plans_file:
+        json.dump(run, plans_file, ensure_ascii=False, indent=2, default=str)
+
+    baseline_path = os.path.join(TEST_PLAN_DIR, 'baseline.json')
+    if TEST_UPDATE_BASELINE or not os.path.exists(baseline_path):
+        with open(baseline_path, 'w', encoding='utf-8') as plans_file:
+            json.dump(run, plans_file, ensure_ascii=False, indent=2, default=str)
+        print(f"\nБазовая линия планов сохранена в {baseline_path}")
+        return
+
+    with open(baseline_path, encoding='utf-8') as plans_file:
+        baseline = json.load(plans_file)
+    print(f"\nСравнение планов с базовой линией от {baseline['captured_at']}:")
+    regressed = 0
+    for name, entry in captured.items():
+        if name not in baseline['queries']:
+            print(f"  {name}: нет в базовой линии")
+            continue
+        regressions, changes = compare_plans(baseline['queries'][name]['summary'], entry['summary'])
+        regressed += bool(regressions)
+        for finding in regressions:
+            print(f"  РЕГРЕССИЯ {name}: {finding}")
+        for finding in changes:
+            print(f"  изменение {name}: {finding}")
+    print(f"Запросов с регрессиями: {regressed} из {len(captured)}")
+
+
+def git_sha():
+    if TEST_GIT_SHA:
+        return TEST_GIT_SHA
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def describe_database():
+    # Server version, non-default settings, the applied Flyway migration, the
+    # seeded dataset (scale is part of its key, see seeding/seed.py) and the
+    # size of every table and index, so runs at several scales show how
+    # indexes grow along with the latencies.
+    conn, _ = acquire_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW server_version")
+            server_version = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT name, current_setting(name) FROM pg_settings
+                WHERE source NOT IN ('default', 'override') ORDER BY name
+            """)
+            settings = dict(cursor.fetchall())
+            cursor.execute("""
+                SELECT c.relname, pg_relation_size(c.oid) FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = 'public' AND c.relkind IN ('r', 'i', 'm')
+                ORDER BY c.relname
+            """)
+            relation_sizes = dict(cursor.fetchall())
+            cursor.execute("SELECT to_regclass('flyway_schema_history'), to_regclass('seed_checkpoints')")
+            has_flyway, has_checkpoints = cursor.fetchone()
+            migration_version = None
+            if has_flyway:
+                cursor.execute("SELECT version FROM flyway_schema_history WHERE success AND version IS NOT NULL "
+                               "ORDER BY installed_rank DESC LIMIT 1")
+                row = cursor.fetchone()
+                migration_version = row[0] if row else None
+            dataset_key = None
+            if has_checkpoints:
+                cursor.execute("SELECT dataset_key FROM seed_checkpoints LIMIT 1")
+                row = cursor.fetchone()
+                dataset_key = row[0] if row else None
+    finally:
+        release_connection(conn)
+    scale = re.search(r"-scale(.+?)-v", dataset_key or "")
+    return {
+        'server_version': server_version,
+        'migration_version': migration_version or os.getenv("MIGRATION_VERSION"),
+        'seed_dataset': dataset_key,
+        'seed_scale': float(scale.group(1)) if scale else None,
+        'settings': settings,
+        'relation_sizes': relation_sizes,
+    }
+
+
+def save_results(started_at, results):
+    # results: query number -> (latency samples in seconds, rows, errors).
+    sha = git_sha()
+    run = {
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'git_sha': sha,
+        'mode': TEST_MODE,
+        'config': {
+            'connection_mode': TEST_CONNECTION_MODE,
+            'query_mode': TEST_QUERY_MODE,
+            'plan_cache_mode': TEST_PLAN_CACHE_MODE,
+            'fetch_mode': TEST_FETCH_MODE,
+            'routing': TEST_ROUTING,
+            'replicas': [replica['name'] for replica in replicas],
+            'clients': TEST_CLIENTS if TEST_MODE == "load" else 1,
+            'repeat': TEST_REPEAT if TEST_MODE == "once" else None,
+            'max_samples': TEST_MAX_SAMPLES if TEST_MODE == "load" else None,
+            'workload': TEST_WORKLOAD,
+            'variant': TEST_VARIANT,
+        },
+        **describe_database(),
+        'queries': {
+            workload[number - 1]['name']: {
+                'number': number,
+                'samples_ms': [round(seconds * 1000, 3) for seconds in samples],
+                'rows': rows,
+                'errors': errors,
+            }
+            for number, (samples, rows, errors) in sorted(results.items())
+        },
+    }
+    os.makedirs(TEST_RESULTS_DIR, exist_ok=True)
+    path = os.path.join(TEST_RESULTS_DIR, f"{started_at:%Y%m%d-%H%M%S}-{TEST_MODE}-{sha[:8]}.json")
+    with open(path, 'w', encoding='utf-8') as results_file:
+        json.dump(run, results_file, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {path}")
+
+
+def load_workload(path=TEST_WORKLOAD):
+    with open(path, encoding='utf-8') as workload_file:
+        queries = yaml.safe_load(workload_file)['queries']
+    for number, query in enumerate(queries, 1):
+        query['number'] = number
+        query.setdefault('weight', 1)
+        variants = query.get('variants') or {}
+        query['sql'] = next((variants[name] for name in TEST_VARIANTS if name in variants), query['sql'])
+        # Reads are SELECTs (or WITH ... SELECT) that neither modify data nor
+        # lock rows; "access" in the workload file overrides the guess.
+        read_only = re.match(r"\s*(SELECT|WITH)\b", query['sql'], re.IGNORECASE) \
+            and not WRITE_KEYWORDS.search(query['sql'])
+        query.setdefault('access', "read" if read_only else "write")
+        if query['access'] not in ACCESS_MODES:
+            raise ValueError(f"{path}: {query['name']}: access must be one of {ACCESS_MODES}")
+        query['params'] = query.get('params') or {}
+        for name, spec in query['params'].items():
+            if 'value' not in spec and spec.get('dist') not in DISTRIBUTIONS:
+                raise ValueError(f"{path}: {query['name']}.{name}: dist must be one of {DISTRIBUTIONS}")
+
+        # PREPARE takes $n placeholders; a name used twice maps to one $n.
+        names = []
+
+        def positional(match):
+            if match.group(1) not in names:
+                names.append(match.group(1))
+            return f"${names.index(match.group(1)) + 1}"
+
+        query['statement'] = f"workload_{number}"
+        # The PREPARE text is sent without parameters, so psycopg2 does not
+        # turn an escaped %% (e.g. the pg_trgm operator) back into %.
+        query['positional_sql'] = PLACEHOLDER.sub(positional, query['sql']).replace('%%', '%')
+        query['param_names'] = names
+        query['execute_sql'] = f"EXECUTE {query['statement']}" + (
+            f" ({', '.join(['%s'] * len(names))})" if names else ""
+        )
     return queries
 
 
-def main():
+def load_key_ranges(queries):
+    # Key ranges named by "keys: table.column" are read once per run.
+    columns = {
+        spec['keys'] for query in queries for spec in query['params'].values() if 'keys' in spec
+    }
+    conn, _ = acquire_connection()
+    try:
+        with conn.cursor() as cursor:
+            for column in sorted(columns):
+                table, key = column.split('.')
+                cursor.execute(f"SELECT COALESCE(MIN({key}), 1), COALESCE(MAX({key}), 1) FROM {table}")
+                key_ranges[column] = cursor.fetchone()
+    finally:
+        release_connection(conn)
+
+
+def zipf_rank(rng, size, s):
+    # Inverse CDF of the continuous power law x^-s on [1, size + 1).
+    u = rng.random()
+    if abs(s - 1) < 1e-9:
+        x = (size + 1.0) ** u
+    else:
+        a = 1 - s
+        x = (((size + 1.0) ** a - 1) * u + 1) ** (1 / a)
+    return min(int(x) - 1, size - 1)
+
+
+def sample_param(rng, spec):
+    if 'value' in spec:
+        return spec['value']
+    dist = spec['dist']
+    if dist == 'choice':
+        return rng.choices(spec['values'], weights=spec.get('weights'))[0]
+    if dist == 'date_range':
+        low, high = spec['days_back']
+        return datetime.now() - timedelta(days=rng.uniform(low, high))
+    low, high = key_ranges[spec['keys']] if 'keys' in spec else (spec['min'], spec['max'])
+    if dist == 'uniform':
+        return rng.randint(low, high)
+    # zipf: rank 0 is the hottest key. Ranks are scattered over the range so
+    # the hot keys are not all on the first pages of the table.
+    size = high - low + 1
+    stride = int(size * 0.6180339887) | 1
+    while math.gcd(stride, size) != 1:
+        stride += 2
+    return low + (zipf_rank(rng, size, spec.get('s', 1.0)) * stride + size // 2) % size
+
+
+def sample_params(rng, query):
+    return {name: sample_param(rng, spec) for name, spec in query['params'].items()}
+
+
+def new_query_stats():
+    return {
+        'count': 0, 'errors': 0, 'rows': 0,
+        'latency': {}, 'connect': {}, 'first_row': {}, 'planning': {}, 'server': {},
+        'targets': {},
+    }
+
+
+def record_latency(histogram, seconds):
+    bucket = int(math.log(max(seconds, 1e-6) * 1e6) / BUCKET_BASE)
+    histogram[bucket] = histogram.get(bucket, 0) + 1
+
+
+def merge_histogram(target, histogram):
+    for bucket, count in histogram.items():
+        target[bucket] = target.get(bucket, 0) + count
+
+
+def record_sample(reservoir, seconds):
+    # Algorithm R: after n values every one of them is kept with probability
+    # TEST_MAX_SAMPLES / n.
+    reservoir['seen'] += 1
+    if len(reservoir['values']) < TEST_MAX_SAMPLES:
+        reservoir['values'].append(seconds)
+        return
+    slot = reservoir['rng'].randrange(reservoir['seen'])
+    if slot < TEST_MAX_SAMPLES:
+        reservoir['values'][slot] = seconds
+
+
+def percentile_ms(histogram, q):
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    rank = math.ceil(total * q)
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return math.exp((bucket + 1) * BUCKET_BASE) / 1000
+    return 0.0
+
+
+def run_load_client(client, stats, samples, deadline, measure_from, measure_start, lock):
+    # Every execution draws a query by its mix weight and samples fresh
+    # parameters for it. measure_start[client] is set when the client's
+    # warmup ends; only executions started after it are measured.
+    rng = random.Random(client)
+    weights = [query['weight'] for query in workload]
+    executions = {}
+    warmup = 0
+    measured = 0
+    while True:
+        if measure_start[client] is None:
+            if (warmup >= TEST_WARMUP_ITERATIONS) if TEST_ITERATIONS else (time.perf_counter() >= measure_from):
+                measure_start[client] = time.perf_counter()
+        if TEST_ITERATIONS and measured >= TEST_ITERATIONS:
+            return
+        if not TEST_ITERATIONS and time.perf_counter() >= deadline:
+            return
+        measuring = measure_start[client] is not None
+        query = rng.choices(workload, weights=weights)[0]
+        number = query['number']
+        params = sample_params(rng, query)
+        executions[number] = executions.get(number, 0) + 1
+        explain = TEST_EXPLAIN_EVERY and executions[number] % TEST_EXPLAIN_EVERY == 0
+        conn = None
+        error = False
+        plan = None
+        try:
+            conn, connect_time = acquire_connection(query)
+            target = connection_target(conn)
+            prepare_query(conn, query)
+            start_time = time.perf_counter()
+            _, row_count, _, first_row_time = fetch_query(conn, query, params)
+            execution_time = time.perf_counter() - start_time
+            if explain:
+                # The query itself succeeded; a failed plan capture is only
+                # logged (release_connection rolls the transaction back).
+                try:
+                    with conn.cursor() as cursor:
+                        plan = explain_query(cursor, query, params)
+                except psycopg2.Error as e:
+                    print(f"Не удалось получить план запроса #{number} ({query['name']}): {e}")
+        except psycopg2.Error:
+            error = True
+        finally:
+            if conn:
+                release_connection(conn)
+        if error:
+            QUERY_ERRORS.labels(query['name']).inc()
+        else:
+            observe_query(query, execution_time, row_count)
+        if not measuring:
+            warmup += 1
+            continue
+        measured += 1
+        with lock:
+            query_stats = stats[client].setdefault(number, new_query_stats())
+            if error:
+                query_stats['errors'] += 1
+                continue
+            query_stats['count'] += 1
+            query_stats['rows'] += row_count
+            record_latency(query_stats['latency'], execution_time)
+            reservoir = samples.setdefault(number, {'seen': 0, 'values': [], 'rng': random.Random(number)})
+            record_sample(reservoir, execution_time)
+            query_stats['targets'][target] = query_stats['targets'].get(target, 0) + 1
+            record_latency(query_stats['first_row'], first_row_time)
+            record_latency(query_stats['connect'], connect_time)
+            if plan:
+                record_latency(query_stats['planning'], plan['Planning Time'] / 1000)
+                record_latency(query_stats['server'], plan['Execution Time'] / 1000)
+
+
+def plan_cache_counts():
+    # Generic and custom plans chosen per statement, summed over the pooled
+    # connections (pg_prepared_statements, PostgreSQL 14+).
+    counts = {}
+    if TEST_QUERY_MODE != "prepared" or not pool:
+        return counts
+    for target_pool in [pool] + [replica['pool'] for replica in replicas if replica['pool']]:
+        connections = [target_pool.getconn() for _ in range(target_pool.maxconn)]
+        try:
+            for conn in connections:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT name, generic_plans, custom_plans FROM pg_prepared_statements")
+                    for name, generic_plans, custom_plans in cursor.fetchall():
+                        generic, custom = counts.get(name, (0, 0))
+                        counts[name] = (generic + generic_plans, custom + custom_plans)
+                conn.rollback()
+        finally:
+            for conn in connections:
+                target_pool.putconn(conn)
+    return counts
+
+
+def run_load():
+    if TEST_CONNECTION_MODE == "pool":
+        pool_time = open_pool(max(TEST_POOL_SIZE, TEST_CLIENTS))
+        print(f"Пул из {max(TEST_POOL_SIZE, TEST_CLIENTS)} соединений открыт за {pool_time:.4f} сек")
+    load_key_ranges(workload)
+
+    if TEST_ITERATIONS:
+        limit = f"{TEST_ITERATIONS} запросов на клиента, прогрев {TEST_WARMUP_ITERATIONS} запросов"
+    else:
+        limit = f"{TEST_DURATION:g} сек, прогрев {TEST_WARMUP:g} сек"
+    print(f"Нагрузочный тест: {TEST_CLIENTS} клиентов, {limit}")
+
+    stats = [{} for _ in range(TEST_CLIENTS)]
+    samples = {}
+    measure_start = [None] * TEST_CLIENTS
+    lock = threading.Lock()
+    started_at = datetime.now()
+    start_time = time.perf_counter()
+    measure_from = start_time + TEST_WARMUP
+    deadline = measure_from + TEST_DURATION
+    clients = [
+        threading.Thread(target=run_load_client,
+                         args=(client, stats, samples, deadline, measure_from, measure_start, lock))
+        for client in range(TEST_CLIENTS)
+    ]
+    try:
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        end_time = time.perf_counter()
+        plan_counts = plan_cache_counts()
+    finally:
+        close_pool()
+
+    totals = {}
+    for client_stats in stats:
+        for number, query_stats in client_stats.items():
+            total = totals.setdefault(number, new_query_stats())
+            total['count'] += query_stats['count']
+            total['errors'] += query_stats['errors']
+            total['rows'] += query_stats['rows']
+            merge_histogram(total['latency'], query_stats['latency'])
+            merge_histogram(total['connect'], query_stats['connect'])
+            merge_histogram(total['first_row'], query_stats['first_row'])
+            merge_histogram(total['planning'], query_stats['planning'])
+            merge_histogram(total['server'], query_stats['server'])
+            for target, count in query_stats['targets'].items():
+                total['targets'][target] = total['targets'].get(target, 0) + count
+    if not totals:
+        print("\nНи один запрос не измерен: весь тест ушёл на прогрев "
+              "(уменьшите TEST_WARMUP/TEST_WARMUP_ITERATIONS или увеличьте TEST_DURATION/TEST_ITERATIONS)")
+        return
+    # Throughput counts from the first client that finished its warmup.
+    elapsed = max(end_time - min(start for start in measure_start if start is not None), 1e-9)
+    print_load_report(totals, elapsed, plan_counts)
+    if TEST_ROUTING == "split":
+        reads = {}
+        for number, query_stats in totals.items():
+            if workload[number - 1]['access'] == "read":
+                for target, count in query_stats['targets'].items():
+                    reads[target] = reads.get(target, 0) + count
+        print_routing_report(reads, elapsed)
+    save_results(started_at, {number: (samples.get(number, {}).get('values', []), query_stats['rows'],
+                                       query_stats['errors'])
+                              for number, query_stats in totals.items()})
+
+
+def print_routing_report(reads, elapsed):
+    # reads: node -> read executions it served during `elapsed` seconds.
+    total = sum(reads.values())
+    replica_reads = sum(count for target, count in reads.items() if target != leader_target())
+    print(f"\nЧтения: {total / elapsed:.1f} в сек, из них реплики: {replica_reads / elapsed:.1f} в сек "
+          f"({replica_reads / max(total, 1):.0%})")
+    for target in sorted(reads):
+        print(f"  {target}: {reads[target]} ({reads[target] / max(total, 1):.0%})")
+    for replica in replicas:
+        lag = "нет данных" if replica['lag'] is None else f"{replica['lag']:.1f} сек"
+        print(f"  отставание {replica['name']}: {lag}{'' if replica['eligible'] else ', исключена'}")
+
+
+def print_load_report(totals, elapsed, plan_counts):
+    print(f"\nРезультаты за {elapsed:.1f} сек (без прогрева, {TEST_QUERY_MODE}, {TEST_FETCH_MODE}), "
+          f"задержки в мс:")
+    print(f"{'запрос':<32} {'выполнено':>10} {'ошибок':>7} {'в сек':>8} "
+          f"{'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'соед. p99':>10} "
+          f"{'1-я стр. p50':>12} {'строк/запрос':>12} "
+          f"{'план p50':>9} {'исп. p50':>9} {'generic/custom':>15}")
+    all_count = 0
+    for number in sorted(totals):
+        query_stats = totals[number]
+        latency = query_stats['latency']
+        all_count += query_stats['count']
+        label = f"#{number} {workload[number - 1]['name']}"
+        print(f"{label:<32} {query_stats['count']:>10} {query_stats['errors']:>7} "
+              f"{query_stats['count'] / elapsed:>8.1f} "
+              f"{percentile_ms(latency, 0.5):>8.2f} {percentile_ms(latency, 0.95):>8.2f} "
+              f"{percentile_ms(latency, 0.99):>8.2f} {percentile_ms(latency, 1.0):>8.2f} "
+              f"{percentile_ms(query_stats['connect'], 0.99):>10.2f} "
+              f"{percentile_ms(query_stats['first_row'], 0.5):>12.2f} "
+              f"{query_stats['rows'] / max(query_stats['count'], 1):>12.1f} "
+              f"{percentile_ms(query_stats['planning'], 0.5):>9.2f} "
+              f"{percentile_ms(query_stats['server'], 0.5):>9.2f} "
+              f"{'/'.join(map(str, plan_counts.get(workload[number - 1]['statement'], ('-', '-')))):>15}")
+    print(f"Пропускная способность: {all_count / elapsed:.1f} запросов в секунду")
+    # ru_maxrss is reported in kilobytes on Linux.
+    print(f"Пик памяти клиента (RSS): {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} МБ")
+
+
+def run_once():
     print("Запуск тестовых запросов к базе данных...")
     total_time = 0
-    queries = generate_test_queries()
-
-    for i, (query, params) in enumerate(queries, 1):
-        print(f"\nЗапрос #{i}:")
-        print(query[:200] + "..." if len(query) > 200 else query)
-        result, exec_time = execute_query(query, params)
-        total_time += exec_time
-        if result and len(result) > 0:
-            print(f"Первые строки результата ({len(result)} всего):")
-            for row in result[:3]:
-                print(row)
+    total_connect_time = 0
+    captured = {}
+    started_at = datetime.now()
+    sampled_params = {}
+    results = {}
+
+    if TEST_CONNECTION_MODE == "pool":
+        pool_time = open_pool()
+        print(f"Пул из {TEST_POOL_SIZE} соединений открыт за {pool_time:.4f} сек")
+
+    try:
+        load_key_ranges(workload)
+        for query in workload:
+            print(f"\nЗапрос #{query['number']} ({query['name']}):")
+            print(query['sql'][:200] + "..." if len(query['sql']) > 200 else query['sql'])
+            # Parameters are seeded by query name, so every run explains the
+            # same statements and the plans stay comparable.
+            params = sampled_params[query['number']] = sample_params(random.Random(query['name']), query)
+            head, row_count, exec_time, connect_time, plan = execute_query(query, params)
+            total_time += exec_time
+            total_connect_time += connect_time
+            if plan:
+                captured[query['name']] = {
+                    'params': params,
+                    'execution_time': exec_time,
+                    'rows': row_count,
+                    'summary': summarize_plan(plan),
+                    'plan': plan,
+                }
+            if head:
+                print(f"Первые строки результата ({row_count} всего):")
+                for row in head:
+                    print(row)
+
+        # The first pass above warms the caches; only the repeats are sampled,
+        # interleaving the queries so drift affects all of them alike.
+        if TEST_REPEAT:
+            print(f"\nПовторных прогонов: {TEST_REPEAT}")
+        for query in workload:
+            results[query['number']] = ([], 0, 0)
+        reads = {}
+        repeat_start = time.perf_counter()
+        for _ in range(TEST_REPEAT):
+            for query in workload:
+                samples, rows, errors = results[query['number']]
+                try:
+                    execution_time, row_count, target = time_query(query, sampled_params[query['number']])
+                    samples.append(execution_time)
+                    rows += row_count
+                    if query['access'] == "read":
+                        reads[target] = reads.get(target, 0) + 1
+                except psycopg2.Error:
+                    QUERY_ERRORS.labels(query['name']).inc()
+                    errors += 1
+                results[query['number']] = (samples, rows, errors)
+        if TEST_ROUTING == "split" and TEST_REPEAT:
+            print_routing_report(reads, time.perf_counter() - repeat_start)
+        save_results(started_at, results)
+    finally:
+        close_pool()
 
     print(f"\nВсе запросы выполнены за {total_time:.4f} секунд")
+    print(f"Получение соединений ({TEST_CONNECTION_MODE}): {total_connect_time:.4f} секунд")
+    save_plans(captured)
+
+
+def main():
+    if TEST_CONNECTION_MODE not in CONNECTION_MODES:
+        raise ValueError(f"TEST_CONNECTION_MODE must be one of {CONNECTION_MODES}, got {TEST_CONNECTION_MODE!r}")
+    if TEST_MODE not in TEST_MODES:
+        raise ValueError(f"TEST_MODE must be one of {TEST_MODES}, got {TEST_MODE!r}")
+    if TEST_QUERY_MODE not in QUERY_MODES:
+        raise ValueError(f"TEST_QUERY_MODE must be one of {QUERY_MODES}, got {TEST_QUERY_MODE!r}")
+    if TEST_FETCH_MODE not in FETCH_MODES:
+        raise ValueError(f"TEST_FETCH_MODE must be one of {FETCH_MODES}, got {TEST_FETCH_MODE!r}")
+    if TEST_FETCH_MODE == "stream" and TEST_QUERY_MODE == "prepared":
+        # DECLARE ... CURSOR only takes a SELECT, not EXECUTE of a prepared statement.
+        raise ValueError("TEST_FETCH_MODE=stream cannot be combined with TEST_QUERY_MODE=prepared")
+    if TEST_ROUTING not in ROUTING_MODES:
+        raise ValueError(f"TEST_ROUTING must be one of {ROUTING_MODES}, got {TEST_ROUTING!r}")
+
+    workload.extend(load_workload())
+    if TEST_METRICS_PORT:
+        start_http_server(TEST_METRICS_PORT)
+        # Export zero error counts before the first failure.
+        for query in workload:
+            QUERY_ERRORS.labels(query['name'])
+        print(f"Метрики Prometheus на порту {TEST_METRICS_PORT}")
+    if TEST_ROUTING == "split":
+        discover_replicas()
+
+    if TEST_MODE == "load":
+        run_load()
+    else:
+        run_once()
+
+    if TEST_METRICS_PORT and TEST_METRICS_LINGER:
+        time.sleep(TEST_METRICS_LINGER)
 
 
 if __name__ == "__main__":